@@ -1,30 +1,40 @@
 """Class for generateing a cross-section from a path of points.
 
-Currently only 2 points can make up a path as in a cross-section.
+The path is a polyline of two or more vertices, and the cross-section points
+are spaced evenly along its total length.
 """
 from typing import Tuple
+from typing import Union
 
 import geopandas as gpd
 import numpy as np
 import numpy.typing as npt
-import pandas as pd
+import shapely
 from shapely.geometry import LineString
-from shapely.geometry import Point
 
 
 class PathGen:
     """Pathgen class."""
 
-    def __init__(self: "PathGen", path_geom: gpd.GeoDataFrame, ny: int) -> None:
+    def __init__(
+        self: "PathGen", path_geom: Union[gpd.GeoDataFrame, LineString], ny: int
+    ) -> None:
         """Init PathGen.
 
         Args:
-            path_geom (gpd.GeoDataFrame): [description]
+            path_geom (Union[gpd.GeoDataFrame, LineString]): Path, a LineString
+                has no CRS.
             ny (int): [description]
         """
         # print(path_geom, ny)
         self.path_geom = path_geom
-        self.width = self.path_geom.geometry[0].length
+        if isinstance(path_geom, gpd.GeoDataFrame):
+            self.line = path_geom.geometry[0]
+            self.crs = path_geom.crs
+        else:
+            self.line = path_geom
+            self.crs = None
+        self.width = self.line.length
         if ny % 2 == 0:
             ny += 1
         self.ny = ny
@@ -34,17 +44,14 @@ class PathGen:
         self.__buildpath()
 
     def __buildpath(self: "PathGen") -> None:
-        line = self.path_geom.geometry[0]
+        line = self.line
         spacing = line.length / self.ny
-        # print(line, spacing)
-        d = 0.0
-        index = 0
-        while d < self.width and index < self.ny:
-            point = line.interpolate(d)
-            self.x[index] = point.x
-            self.y[index] = point.y
-            d += spacing
-            index += 1
+        self.distance = np.arange(self.ny) * spacing
+        xy = shapely.get_coordinates(
+            shapely.line_interpolate_point(line, self.distance)
+        )
+        self.x = xy[:, 0]
+        self.y = xy[:, 1]
 
     def get_xs(self: "PathGen") -> gpd.GeoDataFrame:
         """Get resulting cross-section.
@@ -52,13 +59,11 @@ class PathGen:
         Returns:
             Geopandas Dataframe: Return a Geopandas DataFrame of resulting cross-section
         """
-        points = gpd.GeoSeries(map(Point, zip(self.x, self.y)))
-        ls = LineString((points.to_list()))
-        # print(ls)
-        d = {0: {"name": "section-path", "geometry": ls}}
-        df = pd.DataFrame.from_dict(d, orient="index")
-        gdf = gpd.GeoDataFrame(df, geometry=df.geometry, crs=self.path_geom.crs)
-        return gdf
+        return gpd.GeoDataFrame(
+            {"name": ["section-path"]},
+            geometry=[shapely.linestrings(self.x, self.y)],
+            crs=self.crs,
+        )
 
     def get_xs_points(
         self: "PathGen",
@@ -69,3 +74,11 @@ class PathGen:
             numpy arrays: Returns Numpy arrays of x and y points in cross-section.
         """
         return self.x, self.y
+
+    def get_xs_distance(self: "PathGen") -> npt.NDArray[np.double]:
+        """Get distance of cross-section points along the path.
+
+        Returns:
+            numpy array: Distances along the path, in units of its CRS.
+        """
+        return self.distance
@@ -0,0 +1,98 @@
+"""Generate cross-sections at regular spacing along a stream segment."""
+from typing import Tuple
+
+import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import shapely
+
+from .centerline import Centerline
+from .centerline import num_interp_pts
+
+
+class XSFan:
+    """XSFan class.
+
+    The XSFan class fits a tension spline to a stream segment once and
+    generates cross-sections perpendicular to the spline every spacing along
+    the whole segment. Cross-section points are held as 2-D arrays, one row per
+    cross-section, so the whole fan can be sampled in a single DEM read.
+    """
+
+    def __init__(
+        self: "XSFan",
+        cl_geom: gpd.GeoDataFrame,
+        spacing: float,
+        ny: int,
+        width: float,
+        tension: float = 10.0,
+    ) -> None:
+        """Build cross-sections along a stream segment.
+
+        Args:
+            cl_geom (gpd.GeoDataFrame): Stream segment.
+            spacing (float): Distance along the spline between cross-sections.
+            ny (int): Number of points in each cross-section.
+            width (float): Width of each cross-section.
+            tension (float, optional): Spline tension. Defaults to 10.0.
+        """
+        self.cl_geom = cl_geom
+        self.spacing = spacing
+        self.tension = tension
+        self.width = width
+        self.cl_length = self.cl_geom.geometry[0].length
+        self.nx = num_interp_pts(self.cl_length, len(self.cl_geom.geometry[0].coords))
+        if ny % 2 == 0:
+            ny += 1
+        self.ny = ny
+        self.cl = Centerline(cl_geom, self.nx, self.tension)
+        self._buildfan()
+
+    def _buildfan(self: "XSFan") -> None:
+        stot = self.cl.stot
+        self.stations = np.arange(0.0, stot + 0.5 * self.spacing, self.spacing)
+        self.stations = self.stations[self.stations <= stot]
+        clx, cly, phi = self.cl.evaluate(self.stations)
+        clx, cly, phi = clx[:, None], cly[:, None], phi[:, None]
+        delt = self.delt = np.double(self.width / (self.ny - 1))
+        nm = int((self.ny + 1) / 2)
+        offset = delt * (nm - np.arange(self.ny) - 1)
+        self.x = clx + offset * np.sin(phi)
+        self.y = cly - offset * np.cos(phi)
+
+    def get_xs(self: "XSFan") -> gpd.GeoDataFrame:
+        """Get Geopandas DataFrame of generated cross-sections.
+
+        Returns:
+            Geopandas DataFrame: One cross-section per row with its xs_id and
+                station along the stream segment.
+        """
+        lines = shapely.linestrings(np.stack([self.x, self.y], axis=-1))
+        df = pd.DataFrame(
+            {
+                "name": "cross-section",
+                "xs_id": np.arange(len(lines)),
+                "station": self.stations,
+            }
+        )
+        return gpd.GeoDataFrame(df, geometry=lines, crs=self.cl_geom.crs)
+
+    def get_xs_points(
+        self: "XSFan",
+    ) -> Tuple[npt.NDArray[np.double], npt.NDArray[np.double]]:
+        """Get cross-section points.
+
+        Returns:
+            numpy array: 2-D arrays of x and y points, one row per cross-section.
+        """
+        return self.x, self.y
+
+    def get_xs_distance(self: "XSFan") -> npt.NDArray[np.double]:
+        """Get distance of cross-section points from the first point of each.
+
+        Returns:
+            numpy array: 2-D array of distances, in units of the stream-segment
+                CRS, one row per cross-section.
+        """
+        return np.broadcast_to(self.delt * np.arange(self.ny), self.x.shape)
@@ -1,14 +1,15 @@
 """Generate cross-section using NLDI and user-defined point."""
+from typing import Optional
 from typing import Tuple
+from typing import Union
 
 import geopandas as gpd
 import numpy as np
 import numpy.typing as npt
-import pandas as pd
-from shapely.geometry import LineString
-from shapely.geometry import Point
+import shapely
 
 from .centerline import Centerline
+from .centerline import num_interp_pts
 
 
 class XSGen:
@@ -21,33 +22,41 @@ class XSGen:
 
     def __init__(
         self: "XSGen",
-        point: gpd.GeoDataFrame,
+        point: Union[gpd.GeoDataFrame, Tuple[float, float]],
         cl_geom: gpd.GeoDataFrame,
         ny: int,
         width: float,
         tension: float = 10.0,
+        window: Optional[float] = None,
     ) -> None:
         """Build cross-section using NLDI based on a point near a stream-segment to NHD.
 
         Args:
-            point (gpd.GeoDataFrame): [description]
+            point (Union[gpd.GeoDataFrame, Tuple[float, float]]): Point near the
+                stream-segment, or its (x, y) in the CRS of cl_geom.
             cl_geom (gpd.GeoDataFrame): [description]
             ny (int): [description]
             width (float): [description]
             tension (float, optional): [description]. Defaults to 10.0.  # noqa DAR103
+            window (Optional[float]): Evaluate the spline only within window of
+                the point along the stream-segment, so the cost does not grow
+                with its length. Defaults to None, which samples the whole
+                stream-segment.
         """
         self.cl_geom = cl_geom
         self.point = point
+        if isinstance(point, gpd.GeoDataFrame):
+            self.px, self.py = point.geometry[0].x, point.geometry[0].y
+            self.crs = point.crs
+        else:
+            self.px, self.py = point
+            self.crs = cl_geom.crs
         self.tension = tension
+        self.window = window
         self.width = width
         self.cl_length = self.cl_geom.geometry[0].length
         self.cl_npts = len(self.cl_geom.geometry[0].coords)
-        if self.cl_length < 10.0:
-            self.nx = 10
-        else:
-            self.nx = int(self.cl_length / 3)
-        if self.nx % 2 == 0:
-            self.nx += 1
+        self.nx = num_interp_pts(self.cl_length, self.cl_npts)
         if ny % 2 == 0:
             ny += 1
         self.ny = ny
@@ -55,40 +64,22 @@ class XSGen:
         #     self.nx = int(self.cl_length / 10)
         # else:
         #     self.nx = int(self.cl_length / 1)
-        self.cl = Centerline(cl_geom, self.nx, self.tension)
+        self.cl = Centerline(cl_geom, self.nx, self.tension, sample=window is None)
         self.x = np.zeros(self.ny, dtype=np.double)
         self.y = np.zeros(self.ny, dtype=np.double)
         self._buildxs()
 
-    def _get_perp_index(
-        self: "XSGen", clx: npt.NDArray[np.double], cly: npt.NDArray[np.double]
-    ) -> int:
-        mind = 1e6
-        id = -1
-        for index, p in enumerate(zip(clx, cly)):
-            dist = np.sqrt(
-                np.power(self.point.geometry[0].x - p[0], 2)
-                + np.power(self.point.geometry[0].y - p[1], 2)
-            )
-            if dist < mind:
-                mind = dist
-                id = index
-
-        return id
+    def _get_perp_station(self: "XSGen") -> float:
+        return float(self.cl.project(self.px, self.py, window=self.window))
 
     def _buildxs(self: "XSGen") -> None:
-        clx, cly = self.cl.getinterppts()
-        delt = np.double(self.width / (self.ny - 1))
+        delt = self.delt = np.double(self.width / (self.ny - 1))
         nm = int((self.ny + 1) / 2)
-        index = self._get_perp_index(clx, cly)
-
-        for id, j in enumerate(range(0, self.ny)):
-            self.x[id] = clx[index] + delt * (nm - j - 1) * np.sin(
-                self.cl.getphiinterp(index)
-            )
-            self.y[id] = cly[index] - delt * (nm - j - 1) * np.cos(
-                self.cl.getphiinterp(index)
-            )
+        self.station = self._get_perp_station()
+        clx, cly, phi = self.cl.evaluate(self.station)
+        offset = delt * (nm - np.arange(self.ny) - 1)
+        self.x = clx + offset * np.sin(phi)
+        self.y = cly - offset * np.cos(phi)
 
     def get_xs(self: "XSGen") -> gpd.GeoDataFrame:
         """Get Geopandas DataFrame of generated cross-section.
@@ -96,12 +87,11 @@ class XSGen:
         Returns:
             Geopandas DataFrame: Of generated cross-section
         """
-        points = gpd.GeoSeries(map(Point, zip(self.x, self.y)))
-        ls = LineString((points.to_list()))
-        d = {0: {"name": "cross-section", "geometry": ls}}
-        df = pd.DataFrame.from_dict(d, orient="index")
-        gdf = gpd.GeoDataFrame(df, geometry=df.geometry, crs=self.point.crs)
-        return gdf
+        return gpd.GeoDataFrame(
+            {"name": ["cross-section"]},
+            geometry=[shapely.linestrings(self.x, self.y)],
+            crs=self.crs,
+        )
 
     def get_xs_points(
         self: "XSGen",
@@ -113,16 +103,25 @@ class XSGen:
         """
         return self.x, self.y
 
+    def get_xs_distance(self: "XSGen") -> npt.NDArray[np.double]:
+        """Get distance of cross-section points from its first point.
+
+        Returns:
+            numpy array: Distances, in units of the stream-segment CRS.
+        """
+        return self.delt * np.arange(self.ny)
+
     def get_strm_seg_spline(self: "XSGen") -> gpd.GeoDataFrame:
         """Get the resulting splined stream-segment.
 
         Returns:
             Geopandas DataFrame: Of splined stream-segment.
         """
-        x, y = self.cl.getinterppts()
-        points = gpd.GeoSeries(map(Point, zip(x, y)))
-        ls = LineString((points.to_list()))
-        d = {0: {"name": "strm_seg_spline", "geometry": ls}}
-        df = pd.DataFrame.from_dict(d, orient="index")
-        gdf = gpd.GeoDataFrame(df, geometry=df.geometry)
-        return gdf
+        if self.window is None:
+            x, y = self.cl.getinterppts()
+        else:
+            s = np.linspace(self.station - self.window, self.station + self.window, 101)
+            x, y, _phi = self.cl.evaluate(np.clip(s, 0.0, self.cl.stot))
+        return gpd.GeoDataFrame(
+            {"name": ["strm_seg_spline"]}, geometry=[shapely.linestrings(x, y)]
+        )
@@ -1,16 +1,29 @@
 """Command-line interface."""
 import sys
 from typing import Any
+from typing import List
+from typing import Optional
 from typing import Tuple
 
 import click
 import shapely
 
+from .ancillary import refresh_coverage_index
+from .ancillary import res_types
+from .coverage import coverage_path
 from .nldi_xstool import getxsatendpts
 from .nldi_xstool import getxsatpoint
 
 # 3dep resolution
-resdict = {"1m": 1, "3m": 3, "5m": 5, "10m": 10, "30m": 30, "60m": 60}
+resdict = {
+    "1m": 1,
+    "3m": 3,
+    "5m": 5,
+    "10m": 10,
+    "30m": 30,
+    "60m": 60,
+    "auto": "auto",
+}
 
 # from:
 # https://gis.stackexchange.com/questions/363221/how-do-you-validate-longitude-and-latitude-coordinates-in-python/378885#378885
@@ -52,6 +65,13 @@ def valid_lonlat(ctx: Any, param: Any, value: Any) -> tuple[float, ...]:
     return retval
 
 
+def _numpoints(numpoints: Optional[int], resolution: str, default: int) -> Any:
+    """Number of points given, else auto with auto resolution, else default."""
+    if numpoints is not None:
+        return numpoints
+    return "auto" if resolution.lower() == "auto" else default
+
+
 class NLDIXSTool:
     """Simple class to handle global crs."""
 
@@ -123,24 +143,32 @@ def main(ctx: Any, outcrs: str) -> int:
     help="format lon,lat (x,y) as floats for example: -103.8011 40.2684",
 )
 @click.option(
-    "-n", "--numpoints", default=101, type=int, help="number of points in cross-section"
+    "-n",
+    "--numpoints",
+    default=None,
+    type=int,
+    help="number of points in cross-section, default 101, or one per pixel with auto resolution",
 )
 @click.option(
-    "-w", "--width", default=1000.0, type=float, help="width of cross-section"
+    "-w",
+    "--width",
+    default=1000.0,
+    type=float,
+    help="width of cross-section in meters (EPSG:5070)",
 )
 @click.option(
     "-r",
     "--resolution",
-    type=click.Choice(["1m", "3m", "5m", "10m", "30m", "60m"], case_sensitive=False),
+    type=click.Choice(list(resdict), case_sensitive=False),
     default="10m",
-    help="Resolution of DEM used.  Note: 3DEP provides server side interpolatin given best available data",
+    help="Resolution of DEM used, auto for the finest available.  Note: 3DEP provides server side interpolatin given best available data",
 )
 @click.option("-v", "--verbose", default=False, type=bool, help="verbose ouput")
 @pass_nldi_xstool
 def xsatpoint(
     nldi_xstool: "NLDIXSTool",
     lonlat: Tuple[float, float],
-    numpoints: int,
+    numpoints: Optional[int],
     width: float,
     resolution: str,
     file: str,
@@ -154,7 +182,7 @@ def xsatpoint(
         [description]
     lonlat : Tuple[float, float]
         [description]
-    numpoints : int
+    numpoints : Optional[int]
         [description]
     width : float
         [description]
@@ -187,10 +215,10 @@ def xsatpoint(
     # print(tuple(latlon))
     xs = getxsatpoint(
         point=coord,
-        numpoints=numpoints,
+        numpoints=_numpoints(numpoints, resolution, 101),
         width=width,
         file=file,
-        res=resdict.get(resolution),
+        res=resdict.get(resolution.lower()),
     )
     if not file:
         print(xs.to_json())
@@ -209,6 +237,13 @@ def xsatpoint(
     type=tuple((float, float)),
     help="format x y pair as floats for example: -103.801134 40.267335",
 )
+@click.option(
+    "-m",
+    "--midpt",
+    multiple=True,
+    type=tuple((float, float)),
+    help="intermediate path vertex, repeat for each vertex in order",
+)
 @click.option(
     "-e",
     "--endpt",
@@ -225,23 +260,28 @@ def xsatpoint(
     default="epsg:4326",
 )
 @click.option(
-    "-n", "--numpoints", default=100, type=int, help="number of points in cross-section"
+    "-n",
+    "--numpoints",
+    default=None,
+    type=int,
+    help="number of points in cross-section, default 100, or one per pixel with auto resolution",
 )
 @click.option(
     "-r",
     "--resolution",
-    type=click.Choice(["1m", "3m", "5m", "10m", "30m", "60m"], case_sensitive=False),
+    type=click.Choice(list(resdict), case_sensitive=False),
     default="10m",
-    help="Resolution of DEM used.  Note: 3DEP provides server side interpolatin given best available data",
+    help="Resolution of DEM used, auto for the finest available.  Note: 3DEP provides server side interpolatin given best available data",
 )
 @click.option("-v", "--verbose", default=False, type=bool, help="verbose ouput")
 @pass_nldi_xstool
 def xsatendpts(
     nldi_xstool: "NLDIXSTool",
     startpt: Tuple[float, float],
+    midpt: List[Tuple[float, float]],
     endpt: Tuple[float, float],
     crs: str,
-    numpoints: int,
+    numpoints: Optional[int],
     resolution: str,
     file: str,
     verbose: bool,
@@ -254,11 +294,13 @@ def xsatendpts(
         [description]
     startpt : Tuple[float, float]
         [description]
+    midpt : List[Tuple[float, float]]
+        Intermediate path vertices between startpt and endpt
     endpt : Tuple[float, float]
         [description]
     crs : str
         [description]
-    numpoints : int
+    numpoints : Optional[int]
         [description]
     resolution : str
         [description]
@@ -281,6 +323,7 @@ def xsatendpts(
         print(
             f"input:  {nl}, \
             start: {startpt}, {nl}, \
+            mid: {midpt}, {nl}, \
             end: {endpt}, {nl}, \
             x1:{x1}, y1:{y1}, {nl}, \
             x2:{x2}, y2:{y2}, {nl}, \
@@ -293,15 +336,60 @@ def xsatendpts(
         )
     path = []
     path.append(startpt)
+    path.extend(midpt)
     path.append(endpt)
     # print(type(path))
     xs = getxsatendpts(
-        path=path, numpts=numpoints, res=resdict.get(resolution), crs=crs, file=file
+        path=path,
+        numpts=_numpoints(numpoints, resolution, 100),
+        res=resdict.get(resolution.lower()),
+        crs=crs,
+        file=file,
     )
     if not file:
         print(xs.to_json())
     return 0
 
 
+# Download the local 3DEP coverage index
+
+
+@main.command()
+@click.option(
+    "-f",
+    "--file",
+    default=None,
+    type=str,
+    help="import coverage polygons from this file instead of downloading them",
+)
+@click.option(
+    "--res-col",
+    default="res_type",
+    type=str,
+    help="column of --file naming the resolution key, for example res_1m",
+)
+def refresh_coverage(file: str, res_col: str) -> int:
+    """Download, or import, the local 3DEP coverage index used by query_dems.
+
+    Parameters
+    ----------
+    file : str
+        File of coverage polygons to import, None to download them
+    res_col : str
+        Column of file naming the resolution key of each polygon
+
+    Returns
+    -------
+    int
+        0
+    """
+    index = refresh_coverage_index(file=file, res_col=res_col)
+    counts = index.coverage["res_type"].value_counts()
+    for res_type in res_types:
+        print(f"{res_type}: {counts.get(res_type, 0)} polygons")
+    print(f"written to {coverage_path()}")
+    return 0
+
+
 if __name__ == "__main__":
     sys.exit(main(prog_name="nldi-xstool"))  # pragma: no cover
@@ -1,16 +1,34 @@
 """Ancilarry."""
+import math
+import sqlite3
+import time
+import warnings
+from contextlib import closing
+from pathlib import Path
 from typing import Any
+from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Sequence
 from typing import Tuple
+from typing import Union
 
 import geopandas as gpd
-import requests
+import numpy as np
+import pandas as pd
 from dataretrieval import nwis
 from shapely.geometry import LineString
 from shapely.geometry import Point
 from shapely.geometry import Polygon
 
+from nldi_xstool.cache import cache_dir
+from nldi_xstool.coverage import coverage_path
+from nldi_xstool.coverage import CoverageIndex
+from nldi_xstool.coverage import get_coverage_index
+from nldi_xstool.coverage import res_types
+from nldi_xstool.coverage import set_coverage_index
 from nldi_xstool.ExtADCPBathy import ExtADCPBathy
+from nldi_xstool.transport import get_transport
 
 
 def get_ext_bathy_xs(
@@ -49,6 +67,216 @@ def get_ext_bathy_xs(
 # https://www.ngs.noaa.gov/web_services/ncat/lat-long-height-service.shtml
 
 
+NCAT_URL = "https://www.ngs.noaa.gov/api/ncat/llh"
+
+
+class GageDatumStore:
+    """GageDatumStore class.
+
+    SQLite store of gage datums in meters keyed by site number, with the
+    NWIS vertical datum they were derived from. Gage datums rarely change,
+    so rows are kept until they are older than ttl, after which the site is
+    fetched again and picks up a datum NWIS has moved it to.
+    """
+
+    def __init__(
+        self: "GageDatumStore",
+        path: Optional[Union[str, Path]] = None,
+        ttl: Optional[float] = 30 * 86400.0,
+    ) -> None:
+        """Init GageDatumStore.
+
+        Args:
+            path (Optional[Union[str, Path]]): SQLite file. Defaults to
+                ``cache_dir() / "gage_datums.sqlite"``.
+            ttl (Optional[float]): Age in seconds after which a row is refetched,
+                None to keep rows forever. Defaults to 30 days.
+        """
+        self.path = (
+            Path(path) if path is not None else cache_dir() / "gage_datums.sqlite"
+        )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS gage_datums ("
+                "site TEXT NOT NULL, datum TEXT NOT NULL, fetched REAL NOT NULL, "
+                "datum_m REAL NOT NULL, PRIMARY KEY (site))"
+            )
+
+    def _connect(self: "GageDatumStore") -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30.0)
+
+    def get_many(self: "GageDatumStore", sites: Sequence[str]) -> Dict[str, float]:
+        """Get stored gage datums.
+
+        Args:
+            sites (Sequence[str]): USGS site numbers.
+
+        Returns:
+            Dict[str, float]: Datum in meters of each site stored and not stale.
+        """
+        oldest = -math.inf if self.ttl is None else time.time() - self.ttl
+        out: Dict[str, float] = {}
+        sites = [str(v) for v in sites]
+        with closing(self._connect()) as con, con:
+            for i in range(0, len(sites), 500):
+                chunk = sites[i : i + 500]
+                rows = con.execute(
+                    "SELECT site, datum_m FROM gage_datums WHERE fetched >= ? AND "
+                    f"site IN ({','.join('?' * len(chunk))})",
+                    (oldest, *chunk),
+                ).fetchall()
+                out.update((site, value) for site, value in rows)
+        return out
+
+    def put_many(
+        self: "GageDatumStore", rows: Sequence[Tuple[str, str, float]]
+    ) -> None:
+        """Store gage datums.
+
+        Args:
+            rows (Sequence[Tuple[str, str, float]]): Site number, NWIS vertical
+                datum code and datum in meters of each gage.
+        """
+        now = time.time()
+        with closing(self._connect()) as con, con:
+            con.executemany(
+                "INSERT OR REPLACE INTO gage_datums VALUES (?,?,?,?)",
+                [(str(site), str(datum), now, float(v)) for site, datum, v in rows],
+            )
+
+
+_datum_store: Optional[GageDatumStore] = None
+
+
+def _ncat_payload(si: pd.Series) -> Dict[str, str]:
+    """NCAT NGVD29 to NAVD88 conversion parameters of an NWIS site record."""
+    lat_str = "dec_lat_va"
+    lon_str = "dec_long_va"
+
+    alt_str = "alt_va"
+    indatum_str = "coord_datum_cd"
+    outdatum_str = "NAD83(2011)"
+    in_vert_dataum_str = "NGVD29"
+    out_vert_dataum_str = "NAVD88"
+    if f"{si[indatum_str]}" == "NAD83":
+        indatum = "NAD83(2011)"
+    else:
+        indatum = f"{si[indatum_str]}"
+
+    ohgt = float(si[alt_str]) * 0.3048
+
+    tmplonstr = si[lon_str]
+
+    if len(str(tmplonstr)) == 6:
+        tstr = "0"
+        tmplonstr = tstr + str(tmplonstr)
+
+    return {
+        "lat": f"{si[lat_str]}",
+        "lon": f"{tmplonstr}",
+        "orthoHt": repr(ohgt),
+        "inDatum": indatum,
+        "outDatum": outdatum_str,
+        "inVertDatum": in_vert_dataum_str,
+        "outVertDatum": out_vert_dataum_str,
+    }
+
+
+def _site_records(sites: Sequence[str], chunk: int) -> pd.DataFrame:
+    """NWIS site records of sites indexed by site_no, chunk sites per request.
+
+    Sites of a request that fails are left out with a warning.
+    """
+    records = []
+    for i in range(0, len(sites), chunk):
+        sites_i = list(sites[i : i + chunk])
+        try:
+            records.append(nwis.get_record(sites=sites_i, service="site"))
+        except Exception as ex:
+            warnings.warn(
+                f"unable to get NWIS site records of {sites_i[0]}..{sites_i[-1]}: "
+                f"{ex}",
+                stacklevel=3,
+            )
+    records = [r for r in records if len(r)]
+    if not records:
+        return pd.DataFrame()
+    si = pd.concat(records, ignore_index=True)
+    return si.drop_duplicates("site_no").set_index("site_no")
+
+
+def get_gage_datums(
+    gagenums: Sequence[str],
+    verbose: bool = False,
+    store: Optional[GageDatumStore] = None,
+    chunk: int = 100,
+) -> Dict[str, float]:
+    """Returns the datums of many USGS gages in meters.
+
+    Datums are read from a persistent local store first. The NWIS site
+    records of the remaining gages are fetched in multi-site requests of
+    chunk sites, and NGVD29 datums are converted to NAVD88 with concurrent
+    NOAA NGS NCAT requests. Sites of a request that fails are left
+    unresolved with a warning.
+
+    Parameters
+    ----------
+    gagenums : Sequence[str]
+        USGS Gage numbers
+    verbose : bool, optional
+        Verbose output, by default False
+    store : GageDatumStore, optional
+        Store of gage datums, by default the process-wide store in the cache
+        directory
+    chunk : int, optional
+        Sites per NWIS site request, by default 100
+
+    Returns
+    -------
+    Dict[str, float]
+        USGS Gage datum in meters of each gage, NaN where it could not be
+        resolved
+    """
+    global _datum_store
+    if store is None:
+        if _datum_store is None:
+            _datum_store = GageDatumStore()
+        store = _datum_store
+    sites = [str(v) for v in gagenums]
+    datums = store.get_many(sites)
+    missing = sorted(set(sites) - set(datums))
+    si = _site_records(missing, chunk)
+    if len(si):
+        ngvd = si.index[si["alt_datum_cd"] == "NGVD29"]
+        payloads = [_ncat_payload(si.loc[site]) for site in ngvd]
+        resps = get_transport().get_json_many([(NCAT_URL, p) for p in payloads])
+        rows = []
+        for site, payload, resp in zip(ngvd, payloads, resps):
+            if verbose:
+                print(f"{si.loc[site, 'coord_datum_cd']}")
+                print(f"payload: {payload}")
+                print(resp)
+            if not isinstance(resp, Exception) and "destOrthoht" in resp:
+                rows.append((site, "NGVD29", float(resp["destOrthoht"])))
+            else:
+                warnings.warn(
+                    f"unable to convert the NGVD29 datum of gage {site}: {resp}",
+                    stacklevel=2,
+                )
+        for site in si.index.difference(ngvd):
+            alt = si.loc[site, "alt_va"]
+            if pd.notna(alt):
+                rows.append(
+                    (site, str(si.loc[site, "alt_datum_cd"]), float(alt) * 0.3048)
+                )
+        store.put_many(rows)
+        datums.update((site, value) for site, _datum, value in rows)
+    return {site: datums.get(site, math.nan) for site in sites}
+
+
 def get_gage_datum(gagenum: str, verbose: bool = False) -> float:
     """Returns the datum of USGS gage in meters.
 
@@ -61,66 +289,22 @@ def get_gage_datum(gagenum: str, verbose: bool = False) -> float:
     verbose : bool, optional
         Verbose output, by default False
 
+    Raises
+    ------
+    LookupError
+        The datum of the gage could not be resolved
+
     Returns
     -------
     float
         USGS Gage datum in meters
     """
-    si = nwis.get_record(sites=gagenum, service="site")
-    if si["alt_datum_cd"].values[0] == "NGVD29":
-        # print('conversion')
-        url = "https://www.ngs.noaa.gov/api/ncat/llh"
-        lat_str = "dec_lat_va"
-        lon_str = "dec_long_va"
-
-        alt_str = "alt_va"
-        indatum_str = "coord_datum_cd"
-        outdatum_str = "NAD83(2011)"
-        in_vert_dataum_str = "NGVD29"
-        out_vert_dataum_str = "NAVD88"
-        if f"{si[indatum_str].values[0]}" == "NAD83":
-            indatum = "NAD83(2011)"
-        else:
-            indatum = f"{si[indatum_str].values[0]}"
-
-        ohgt = float(si[alt_str].values[0]) * 0.3048
-
-        tmplonstr = si[lon_str].values[0]
-
-        if len(str(tmplonstr)) == 6:
-            tstr = "0"
-            tmplonstr = tstr + str(tmplonstr)
-
-        payload = {
-            "lat": f"{si[lat_str].values[0]}",
-            "lon": f"{tmplonstr}",
-            "orthoHt": repr(ohgt),
-            "inDatum": indatum,
-            "outDatum": outdatum_str,
-            "inVertDatum": in_vert_dataum_str,
-            "outVertDatum": out_vert_dataum_str,
-        }
-        r = requests.get(url, params=payload)
-        resp = r.json()
-        if verbose:
-            print(f"{si[indatum_str].values[0]}")
-            print(f"payload: {payload}")
-            print(resp)
-        return float(resp["destOrthoht"])
-    else:
-        # print('non-conversion')
-        return float(si["alt_va"].values[0] * 0.3048)
-
-
-# Resolution types and their respective IDs for the Rest Service
-res_types = {
-    "res_1m": 18,
-    "res_3m": 19,
-    "res_5m": 20,
-    "res_10m": 21,
-    "res_30m": 22,
-    "res_60m": 23,
-}
+    datum = get_gage_datums([gagenum], verbose=verbose)[str(gagenum)]
+    if math.isnan(datum):
+        raise LookupError(f"Unable to resolve the datum of gage {gagenum}")
+    return datum
+
+
 # res_types = {'res_1m': 1, 'res_3m': 2, 'res_5m': 3, 'res_10m': 4, 'res_30m': 5, 'res_60m': 6}
 dim_order = {"latlon": 0, "lonlat": 1}
 # Create a bounding box from any geo type
@@ -186,30 +370,15 @@ def convert_width(width: int) -> int:
 # Get request from arcgis Rest Services
 
 
-def get_dem(bbox: Tuple[float, float, float, float], res_type: str) -> bool:
-    """Esri map service query of 3DEPElevationIncex using bounding box.
-
-    Return the True if res_type (Resolution of 3DEP elevation) intersects bounding box (bbox)
-
-    Parameters
-    ----------
-    bbox : Tuple[float, float, float, float]
-        (minx, miny, maxx, maxy)
-    res_type : str
-        Key in: res_types = {"res_1m": 18, "res_3m": 19,"res_5m": 20,
-            "res_10m": 21,"res_30m": 22,"res_60m": 23,}
-
-    Returns
-    -------
-    bool
-        True if bbox intersects 3DEP elevation with res_type
-    """
+def _dem_query(
+    bbox: Tuple[float, float, float, float], res_type: str
+) -> Tuple[str, Dict[str, str]]:
+    """Get URL and parameters of a 3DEPElevationIndex query of res_type in bbox."""
     minx = str(bbox[0])
     miny = str(bbox[1])
     maxx = str(bbox[2])
     maxy = str(bbox[3])
     res_id = res_types[res_type]
-    return_val = False
 
     url = f"https://index.nationalmap.gov/arcgis/rest/services/3DEPElevationIndex/MapServer/{res_id}/query"
     payload = {
@@ -259,9 +428,12 @@ def get_dem(bbox: Tuple[float, float, float, float], res_type: str) -> bool:
         "f": "geojson",
     }
 
-    r = requests.get(url, params=payload)
-    resp = r.json()
+    return url, payload
+
 
+def _has_dem(resp: Dict[str, Any]) -> bool:
+    """Whether a 3DEPElevationIndex query response has any features."""
+    return_val = False
     # If the Rest Services has a 200 response
     if "features" in resp:
         # If the features are not empty, then the DEM exist
@@ -276,6 +448,47 @@ def get_dem(bbox: Tuple[float, float, float, float], res_type: str) -> bool:
     return return_val
 
 
+def get_dem(bbox: Tuple[float, float, float, float], res_type: str) -> bool:
+    """Esri map service query of 3DEPElevationIncex using bounding box.
+
+    Return the True if res_type (Resolution of 3DEP elevation) intersects bounding box (bbox)
+
+    Answered from the local coverage index instead of the REST service once
+    it has been downloaded with refresh_coverage_index.
+
+    Parameters
+    ----------
+    bbox : Tuple[float, float, float, float]
+        (minx, miny, maxx, maxy)
+    res_type : str
+        Key in: res_types = {"res_1m": 18, "res_3m": 19,"res_5m": 20,
+            "res_10m": 21,"res_30m": 22,"res_60m": 23,}
+
+    Returns
+    -------
+    bool
+        True if bbox intersects 3DEP elevation with res_type
+    """
+    index = get_coverage_index()
+    if index is not None:
+        return index.query(bbox, [res_type])[res_type]
+    return _has_dem(get_transport().get_json(*_dem_query(bbox, res_type)))
+
+
+def _query_res_types(bbox: Tuple[float, float, float, float]) -> Dict[str, bool]:
+    """Query every resolution of the 3DEPElevationIndex in bbox concurrently."""
+    index = get_coverage_index()
+    if index is not None:
+        return index.query(bbox, list(res_types))
+    resps = get_transport().get_json_many(
+        [_dem_query(bbox, res_type) for res_type in res_types]
+    )
+    for resp in resps:
+        if isinstance(resp, Exception):
+            raise resp
+    return {res_type: _has_dem(resp) for res_type, resp in zip(res_types, resps)}
+
+
 # The function to loop thru all resolutions and submit queries
 
 
@@ -284,6 +497,9 @@ def query_dems(
 ) -> Any:
     """Query 3DEPElevation Index based on shape type and coordinates for available spatial resolution.
 
+    Answered from the local coverage index instead of the REST service once
+    it has been downloaded with refresh_coverage_index.
+
     Parameters
     ----------
     shape_type : str
@@ -298,16 +514,10 @@ def query_dems(
     Any
         Dictionary of query keys for example: res_1m, and bool intersection values.
     """
-    resp = {}  # Create an empty dictionary for the response
     bbox = make_bbox(shape_type, coords, width)  # Make the bbox
     print(bbox)
-    for (
-        res_type
-    ) in res_types:  # Loop thru all resolutions and submit a query for each one
-        resp[res_type] = get_dem(bbox, res_type)  # Add the response to the dictionary
-
-    # print(resp)
-    return resp
+    # Submit a query for all resolutions at once
+    return _query_res_types(bbox)
 
 
 def query_dems_shape(bbox: Tuple[float, float, float, float]) -> Any:
@@ -315,6 +525,9 @@ def query_dems_shape(bbox: Tuple[float, float, float, float]) -> Any:
 
     Uses esriSpatialRelIntersects - Query Geometry Intersects Target Geometry.
 
+    Answered from the local coverage index instead of the REST service once
+    it has been downloaded with refresh_coverage_index.
+
     Parameters
     ----------
     bbox : Tuple[float]
@@ -325,8 +538,64 @@ def query_dems_shape(bbox: Tuple[float, float, float, float]) -> Any:
     Dict
         Boolian values associated with resolution keys.
     """
-    resp = {}
+    return _query_res_types(bbox)
+
+
+def query_dems_bulk(
+    bboxes: Sequence[Tuple[float, float, float, float]],
+) -> pd.DataFrame:
+    """Query 3DEP Elevation Index for available spatial resolution of many bboxes.
+
+    The queries of every bbox and resolution are sent concurrently over the
+    shared transport's connection pools, or answered from the local coverage
+    index once it has been downloaded with refresh_coverage_index.
+
+    Parameters
+    ----------
+    bboxes : Sequence[Tuple[float, float, float, float]]
+        (minx, miny, maxx, maxy) of each site
 
-    for res_type in res_types:
-        resp[res_type] = get_dem(bbox, res_type)
-    return resp
+    Returns
+    -------
+    pd.DataFrame
+        Availability matrix, one row per bbox and one nullable boolean column
+        per resolution key; <NA> where the query failed.
+    """
+    index = get_coverage_index()
+    if index is not None:
+        return index.query_many(bboxes, list(res_types))
+    queries = [_dem_query(bbox, res_type) for bbox in bboxes for res_type in res_types]
+    resps = get_transport().get_json_many(queries)
+    values = [None if isinstance(r, Exception) else _has_dem(r) for r in resps]
+    return pd.DataFrame(
+        np.array(values, dtype=object).reshape(len(bboxes), len(res_types)),
+        columns=list(res_types),
+    ).astype("boolean")
+
+
+def refresh_coverage_index(
+    file: Optional[str] = None, res_col: str = "res_type"
+) -> CoverageIndex:
+    """Download, or import, the local 3DEP coverage index.
+
+    Parameters
+    ----------
+    file : str, optional
+        File of coverage polygons to import instead of downloading them from
+        the 3DEPElevationIndex, by default None
+    res_col : str, optional
+        Column of file naming the resolution key of each polygon, by default
+        "res_type"
+
+    Returns
+    -------
+    CoverageIndex
+        Index written to coverage_path() and used by query_dems from now on.
+    """
+    if file:
+        index = CoverageIndex.read(file, res_col=res_col)
+    else:
+        index = CoverageIndex.download(res_types)
+    index.write(coverage_path())
+    set_coverage_index(index)
+    return index
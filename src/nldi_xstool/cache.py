@@ -0,0 +1,302 @@
+"""Persistent on-disk cache of 3DEP DEM rasters.
+
+DEM requests are snapped outward to a grid sized in pixels of the requested
+resolution, so cross-sections requested a few meters apart on the same reach
+resolve to the same cache entry. Entries are content addressed by the snapped
+bounding box, resolution and CRS, and evicted least-recently-used once the
+cache grows past its size limit.
+"""
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import py3dep
+import xarray as xr
+
+BBox = Tuple[float, float, float, float]
+
+# pixels py3dep.get_map adds around every request on each side
+FETCH_MARGIN = 20
+
+# the netCDF4/HDF5 libraries are not thread-safe
+_netcdf_lock = threading.Lock()
+
+
+def cache_dir() -> Path:
+    """Get the root directory used for nldi_xstool caches.
+
+    The directory is taken from the ``NLDI_XSTOOL_CACHE_DIR`` environment
+    variable and defaults to ``~/.cache/nldi_xstool``.
+
+    Returns:
+        Path: Root cache directory.
+    """
+    root = os.environ.get("NLDI_XSTOOL_CACHE_DIR")
+    if root:
+        return Path(root)
+    return Path.home() / ".cache" / "nldi_xstool"
+
+
+def fetch_3dep(bbox: BBox, res: int, crs: str) -> xr.DataArray:
+    """Download a DEM from 3DEP.
+
+    Args:
+        bbox (BBox): (minx, miny, maxx, maxy) in crs.
+        res (int): Resolution of DEM in meters.
+        crs (str): CRS of bbox and of returned DEM.
+
+    Returns:
+        xr.DataArray: DEM covering bbox.
+    """
+    return py3dep.get_map("DEM", bbox, resolution=res, geo_crs=crs, crs=crs)
+
+
+class DEMCache:
+    """DEMCache class.
+
+    Content-addressed on-disk cache of DEM rasters with size-bounded LRU
+    eviction. Entries are written to a temporary file and atomically renamed
+    into place, so several worker processes can share one cache directory
+    without locking; a reader racing an eviction simply sees a miss.
+    """
+
+    def __init__(
+        self: "DEMCache",
+        path: Optional[Union[str, Path]] = None,
+        max_bytes: int = 2 * 1024**3,
+        tile_pixels: int = 128,
+        fetcher: Callable[[BBox, int, str], xr.DataArray] = fetch_3dep,
+    ) -> None:
+        """Init DEMCache.
+
+        Args:
+            path (Optional[Union[str, Path]]): Cache directory. Defaults to
+                ``cache_dir() / "dem"``.
+            max_bytes (int): Size limit of the cache in bytes. Defaults to 2 GiB.
+            tile_pixels (int): Size, in pixels of the requested resolution, of the
+                grid requests are snapped to. Defaults to 128.
+            fetcher (Callable[[BBox, int, str], xr.DataArray]): Function used to
+                download a DEM on a cache miss. Defaults to fetch_3dep.
+        """
+        self.path = Path(path) if path is not None else cache_dir() / "dem"
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.tile_pixels = tile_pixels
+        self.fetcher = fetcher
+        self.hits = 0
+        self.misses = 0
+
+    def snap_bbox(
+        self: "DEMCache", bbox: BBox, res: int, tile_pixels: Optional[int] = None
+    ) -> BBox:
+        """Snap bounding box outward to the cache grid.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy).
+            res (int): Resolution of DEM in meters.
+            tile_pixels (Optional[int]): Size, in pixels, of the grid cells.
+                Defaults to the cache's tile_pixels.
+
+        Returns:
+            BBox: Snapped bounding box containing bbox.
+        """
+        step = float((tile_pixels or self.tile_pixels) * res)
+        return (
+            math.floor(bbox[0] / step) * step,
+            math.floor(bbox[1] / step) * step,
+            math.ceil(bbox[2] / step) * step,
+            math.ceil(bbox[3] / step) * step,
+        )
+
+    def key(
+        self: "DEMCache",
+        bbox: BBox,
+        res: int,
+        crs: str,
+        tile_pixels: Optional[int] = None,
+    ) -> str:
+        """Get the cache key of a request.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy).
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of bbox.
+            tile_pixels (Optional[int]): Size, in pixels, of the grid cells.
+                Defaults to the cache's tile_pixels.
+
+        Returns:
+            str: Hex digest identifying the snapped request.
+        """
+        snapped = self.snap_bbox(bbox, res, tile_pixels)
+        desc = json.dumps(
+            {"bbox": [round(v, 6) for v in snapped], "res": res, "crs": crs.lower()},
+            sort_keys=True,
+        )
+        return hashlib.sha256(desc.encode("utf-8")).hexdigest()
+
+    def _file(self: "DEMCache", key: str) -> Path:
+        return self.path / f"{key}.nc"
+
+    def get(
+        self: "DEMCache",
+        bbox: BBox,
+        res: int,
+        crs: str,
+        tile_pixels: Optional[int] = None,
+    ) -> Optional[xr.DataArray]:
+        """Get a cached DEM covering bbox.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy).
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of bbox.
+            tile_pixels (Optional[int]): Size, in pixels, of the grid cells.
+                Defaults to the cache's tile_pixels.
+
+        Returns:
+            Optional[xr.DataArray]: Cached DEM or None on a miss.
+        """
+        file = self._file(self.key(bbox, res, crs, tile_pixels))
+        try:
+            with _netcdf_lock, xr.open_dataarray(file) as da:
+                dem = da.load()
+            # mtime records last access for LRU eviction
+            os.utime(file)
+        except (OSError, ValueError):
+            return None
+        return dem
+
+    def put(
+        self: "DEMCache",
+        bbox: BBox,
+        res: int,
+        crs: str,
+        dem: xr.DataArray,
+        tile_pixels: Optional[int] = None,
+    ) -> None:
+        """Store a DEM in the cache and evict entries above the size limit.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy) the DEM was requested with.
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of bbox.
+            dem (xr.DataArray): DEM to store.
+            tile_pixels (Optional[int]): Size, in pixels, of the grid cells.
+                Defaults to the cache's tile_pixels.
+        """
+        file = self._file(self.key(bbox, res, crs, tile_pixels))
+        out = dem.copy()
+        out.attrs = {k: v for k, v in dem.attrs.items() if v is not None}
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.path)
+        os.close(fd)
+        try:
+            with _netcdf_lock:
+                out.to_netcdf(tmp)
+            os.replace(tmp, file)
+        except Exception:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def fetch(
+        self: "DEMCache",
+        bbox: BBox,
+        res: int,
+        crs: str,
+        tile_pixels: Optional[int] = None,
+    ) -> xr.DataArray:
+        """Get DEM covering bbox from the cache, downloading it on a miss.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy).
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of bbox and of returned DEM.
+            tile_pixels (Optional[int]): Size, in pixels, of the grid cells
+                bbox is snapped to. Defaults to the cache's tile_pixels.
+
+        Returns:
+            xr.DataArray: DEM covering the snapped bbox.
+        """
+        dem = self.get(bbox, res, crs, tile_pixels)
+        if dem is not None:
+            self.hits += 1
+            return dem
+        self.misses += 1
+        snapped = self.snap_bbox(bbox, res, tile_pixels)
+        dem = self.fetcher(snapped, res, crs)
+        self.put(bbox, res, crs, dem, tile_pixels)
+        return dem
+
+    def _entries(self: "DEMCache") -> List[Tuple[float, int, Path]]:
+        entries = []
+        for file in self.path.glob("*.nc"):
+            try:
+                st = file.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, file))
+        return entries
+
+    def size(self: "DEMCache") -> int:
+        """Get the total size of cached DEMs.
+
+        Returns:
+            int: Size in bytes.
+        """
+        return sum(e[1] for e in self._entries())
+
+    def evict(self: "DEMCache") -> None:
+        """Remove least-recently-used entries until the cache fits max_bytes."""
+        entries = sorted(self._entries(), key=lambda e: e[0])
+        total = sum(e[1] for e in entries)
+        for _mtime, nbytes, file in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                file.unlink()
+            except OSError:
+                continue
+            total -= nbytes
+
+    def clear(self: "DEMCache") -> None:
+        """Remove all cached DEMs."""
+        for _mtime, _nbytes, file in self._entries():
+            file.unlink(missing_ok=True)
+
+
+_dem_cache: Optional[DEMCache] = None
+
+
+def get_dem_cache() -> DEMCache:
+    """Get the process-wide DEM cache.
+
+    The size limit, in megabytes, may be set with the
+    ``NLDI_XSTOOL_DEM_CACHE_MB`` environment variable.
+
+    Returns:
+        DEMCache: Shared DEM cache.
+    """
+    global _dem_cache
+    if _dem_cache is None:
+        mbytes = int(os.environ.get("NLDI_XSTOOL_DEM_CACHE_MB", "2048"))
+        _dem_cache = DEMCache(max_bytes=mbytes * 1024**2)
+    return _dem_cache
+
+
+def set_dem_cache(cache: DEMCache) -> None:
+    """Replace the process-wide DEM cache.
+
+    Args:
+        cache (DEMCache): DEM cache to use.
+    """
+    global _dem_cache
+    _dem_cache = cache
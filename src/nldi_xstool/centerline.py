@@ -1,12 +1,36 @@
 """Centerline."""
 from typing import Any
+from typing import Optional
 from typing import Tuple
 
 import geopandas as gpd
 import numpy as np
 import numpy.typing as npt
+import shapely
+from scipy.spatial import cKDTree
 
-from .tspline import tspline
+from .tspline import HAVE_NUMBA
+from .tspline import TensionSpline
+
+
+def num_interp_pts(cl_length: float, cl_npts: int) -> int:
+    """Get the number of points to evaluate the centerline spline at.
+
+    About one point every 3 map units, but no more than 10 per centerline
+    vertex: the dense samples only seed the projection onto the spline, which
+    is refined exactly, so long reaches need not be sampled finely.
+
+    Args:
+        cl_length (float): Centerline length.
+        cl_npts (int): Number of centerline vertices.
+
+    Returns:
+        int: Odd number of interpolation points, at least 11.
+    """
+    nx = max(10, min(int(cl_length / 3), 10 * cl_npts))
+    if nx % 2 == 0:
+        nx += 1
+    return nx
 
 
 class Centerline:
@@ -17,7 +41,12 @@ class Centerline:
     """
 
     def __init__(
-        self: "Centerline", center_shp: gpd.GeoDataFrame, nx: int, tension: float
+        self: "Centerline",
+        center_shp: gpd.GeoDataFrame,
+        nx: int,
+        tension: float,
+        sample: bool = True,
+        use_numba: bool = HAVE_NUMBA,
     ) -> None:
         """Init Centerline class.
 
@@ -25,7 +54,14 @@ class Centerline:
             center_shp (gpd.GeoDataFrame): centerline shape
             nx (int): Number of interpolatin points.
             tension (float): Centerline tension-spline interpolation tension (.1 - 100.)
+            sample (bool): Evaluate the spline at the nx interpolation points.
+                When False the spline is only factored, and is evaluated on
+                demand with evaluate() and project(window=...). Defaults to True.
+            use_numba (bool): Evaluate the spline with the compiled numba
+                kernel. Defaults to True when numba is installed.
         """
+        self.sample = sample
+        self.use_numba = use_numba
         self.center_shp = center_shp
         self.gpdata = center_shp
         self.x = np.empty(0, dtype=np.double)
@@ -46,17 +82,11 @@ class Centerline:
         self.__getspline(nx, self.tension)
 
     def __initialize(self: "Centerline") -> None:
-        tx = []
-        ty = []
-        for _index, row in self.gpdata.iterrows():
-            for pt in list(row["geometry"].coords):
-                # print(pt, type(pt))
-                tx.append(pt[0])
-                ty.append(pt[1])
-        self.x = np.array(tx)
-        self.y = np.array(ty)
+        xy = shapely.get_coordinates(self.gpdata.geometry.values)
+        self.x = xy[:, 0].copy()
+        self.y = xy[:, 1].copy()
         self.numclpts = self.x.size
-        print(self.numclpts)
+        self._line = shapely.linestrings(self.x, self.y)
 
     # def description(self):
     #     return "{} used the shapfile {}".format("centerline", self.center_shp)
@@ -93,7 +123,6 @@ class Centerline:
         Returns:
             [type]: [description]
         """
-        print(tension)
         self.__getspline(numinterppts, tension)
         return self.xo_interp, self.yo_interp
 
@@ -113,107 +142,142 @@ class Centerline:
         self.si = np.zeros(self.numclpts)
         self.temp = np.zeros(self.numclpts)
         self.yp = np.zeros(self.numclpts)
-
-        for i in range(0, self.numclpts):
-            if i == 0:
-                self.si[i] = 0.0
-            else:
-                ds = np.power(
-                    (
-                        np.power((self.x[i] - self.x[i - 1]), 2)
-                        + np.power((self.y[i] - self.y[i - 1]), 2)
-                    ),
-                    0.5,
-                )
-                self.si[i] = self.si[i - 1] + ds
+        self.si[1:] = np.cumsum(np.hypot(np.diff(self.x), np.diff(self.y)))
 
         self.stot = self.si[self.numclpts - 1]
-        for i in range(0, self.numInterpPts):
-            self.sout[i] = i * self.stot / (self.numInterpPts - 1)
-            # if i == 0:
-            #     nsInc = self.stot / (self.numInterpPts - 1)
+        if self.sample:
+            self.sout = (
+                np.arange(self.numInterpPts) * self.stot / (self.numInterpPts - 1)
+            )
         if self.numclpts < 3:
-            self.yp = np.zeros(3)
-            self.temp = np.zeros(3)
-            sitmp = np.zeros(3)
-            sitmp = np.append(sitmp, [self.si[0]])
-            sitmp = np.append(sitmp, [self.si[1] / 2])
-            sitmp = np.append(sitmp, self.si[1])
-
-            txctmp = np.zeros(3)
-            txctmp = np.append(txctmp, self.x[0])
-            txctmp = np.append(txctmp, self.x[0] + (self.x[1] - self.x[0]) / 2.0)
-            txctmp = np.append(txctmp, self.x[1])
-
-            tyctmp = np.zeros(3)
-            tyctmp = np.append(tyctmp, self.y[0])
-            tyctmp = np.append(tyctmp, self.y[0] + (self.y[1] - self.y[0]) / 2.0)
-            tyctmp = np.append(tyctmp, self.y[1])
-
-            tspline(
-                sitmp,
-                txctmp,
-                3,
-                self.sout,
-                self.xo_interp,
-                self.numInterpPts,
-                self.tension,
-                self.yp,
-                self.temp,
+            # a straight segment, splined through its midpoint
+            si = np.array([self.si[0], self.si[1] / 2.0, self.si[1]])
+            x = np.array(
+                [self.x[0], self.x[0] + (self.x[1] - self.x[0]) / 2.0, self.x[1]]
             )
-            tspline(
-                sitmp,
-                tyctmp,
-                3,
-                self.sout,
-                self.yo_interp,
-                self.numInterpPts,
-                self.tension,
-                self.yp,
-                self.temp,
+            y = np.array(
+                [self.y[0], self.y[0] + (self.y[1] - self.y[0]) / 2.0, self.y[1]]
             )
+            self.yp = np.zeros(3)
+            self.temp = np.zeros(3)
         else:
-            tspline(
-                self.si,
-                self.x,
-                self.numclpts,
-                self.sout,
-                self.xo_interp,
-                self.numInterpPts,
-                self.tension,
-                self.yp,
-                self.temp,
-            )
-            tspline(
-                self.si,
-                self.y,
-                self.numclpts,
-                self.sout,
-                self.yo_interp,
-                self.numInterpPts,
-                self.tension,
-                self.yp,
-                self.temp,
-            )
+            si, x, y = self.si, self.x, self.y
+        self.xspline = TensionSpline(
+            si, x, self.tension, yp=self.yp, temp=self.temp, use_numba=self.use_numba
+        )
+        self.yspline = TensionSpline(
+            si,
+            y,
+            self.tension,
+            yp=self.xspline.yp,
+            temp=self.temp,
+            use_numba=self.use_numba,
+        )
+        self.yp = self.yspline.yp
+        self._tree = None
+        if not self.sample:
+            self.sout = np.empty(0, dtype=np.double)
+            self.xo_interp = self.yo_interp = self.sout
+            self.phi_interp = self.r_interp = self.sout
+            return
+        self.xo_interp = self.xspline(self.sout)
+        self.yo_interp = self.yspline(self.sout)
         self.__calc_curvature()
 
     def __calc_curvature(self: "Centerline") -> None:
-        for i in range(1, self.numInterpPts):
-            dx = self.xo_interp[i] - self.xo_interp[i - 1]
-            dy = self.yo_interp[i] - self.yo_interp[i - 1]
-            if dx == 0.0:
-                if dy > 0.0:
-                    self.phi_interp[i] = np.pi / 2.0
-                elif dy < 0.0:
-                    self.phi_interp[i] = -1.0 * np.pi / 2.0
-            else:
-                self.phi_interp[i] = np.arctan2(dy, dx)
+        dx = np.diff(self.xo_interp)
+        dy = np.diff(self.yo_interp)
+        # arctan2 gives +-pi/2 on vertical steps and 0 on repeated points
+        self.phi_interp[1:] = np.arctan2(dy, dx)
         self.phi_interp[0] = (2.0 * self.phi_interp[1]) - self.phi_interp[2]
         scals: np.double = self.stot / (self.numInterpPts - 1)
-        for i in range(1, self.numInterpPts):
-            dx = self.xo_interp[i] - self.xo_interp[i - 1]
-            dphi = np.fabs(self.phi_interp[i]) - np.fabs(self.phi_interp[i - 1])
-            if dphi <= 0.0001:
-                self.r_interp[i] = 100000000.0
-            else:
-                self.r_interp[i] = scals / dphi
+        dphi = np.fabs(self.phi_interp[1:]) - np.fabs(self.phi_interp[:-1])
+        self.r_interp[1:] = np.divide(
+            scals, dphi, out=np.full(dphi.size, 100000000.0), where=dphi > 0.0001
+        )
+
+    def evaluate(
+        self: "Centerline", s: npt.ArrayLike
+    ) -> Tuple[npt.NDArray[np.double], npt.NDArray[np.double], npt.NDArray[np.double]]:
+        """Evaluate the spline at stations along the centerline.
+
+        Args:
+            s (npt.ArrayLike): Stations, in map units from the first vertex.
+
+        Returns:
+            Tuple: x, y and heading (radians) of the spline at s.
+        """
+        s = np.asarray(s, dtype=np.double)
+        phi = np.arctan2(self.yspline.derivative(s), self.xspline.derivative(s))
+        return self.xspline(s), self.yspline(s), phi
+
+    def project(
+        self: "Centerline",
+        px: npt.ArrayLike,
+        py: npt.ArrayLike,
+        window: Optional[float] = None,
+    ) -> npt.NDArray[np.double]:
+        """Get stations of the feet of the perpendiculars from points to the spline.
+
+        The seed of a Newton iteration on the spline parameter is the nearest
+        interpolated point, found with a KD-tree. With a window, the seed is
+        instead searched for among 21 spline points within window of the
+        projection onto the centerline polyline, so the cost does not grow
+        with the length of the centerline.
+
+        Args:
+            px (npt.ArrayLike): x of points.
+            py (npt.ArrayLike): y of points.
+            window (Optional[float]): Half-length of the arc-length window the
+                spline is evaluated in. Defaults to None.
+
+        Raises:
+            ValueError: No window is given and the spline was not sampled.
+
+        Returns:
+            npt.NDArray[np.double]: Stations, clipped to the centerline.
+        """
+        px = np.asarray(px, dtype=np.double)
+        py = np.asarray(py, dtype=np.double)
+        if window is not None:
+            s0 = shapely.line_locate_point(self._line, shapely.points(px, py))
+            s = np.clip(
+                s0[..., None] + np.linspace(-window, window, 21), 0.0, self.stot
+            )
+            dist = np.hypot(
+                self.xspline(s) - px[..., None], self.yspline(s) - py[..., None]
+            )
+            seed = np.take_along_axis(s, dist.argmin(axis=-1)[..., None], axis=-1)
+            return self._refine(seed[..., 0], px, py)
+        if not self.sample:
+            raise ValueError("project needs a window when the spline is not sampled")
+        if self._tree is None:
+            self._tree = cKDTree(np.column_stack([self.xo_interp, self.yo_interp]))
+        _dist, index = self._tree.query(np.stack([px, py], axis=-1))
+        return self._refine(self.sout[index], px, py)
+
+    def _refine(
+        self: "Centerline",
+        s: npt.NDArray[np.double],
+        px: npt.NDArray[np.double],
+        py: npt.NDArray[np.double],
+    ) -> npt.NDArray[np.double]:
+        """Newton iteration for the stations closest to points."""
+        for _ in range(20):
+            ex = self.xspline(s) - px
+            ey = self.yspline(s) - py
+            dx = self.xspline.derivative(s)
+            dy = self.yspline.derivative(s)
+            grad = ex * dx + ey * dy
+            hess = (
+                dx * dx
+                + dy * dy
+                + ex * self.xspline.derivative(s, 2)
+                + ey * self.yspline.derivative(s, 2)
+            )
+            # keep the seed where the distance is not locally convex
+            step = np.divide(grad, hess, out=np.zeros_like(grad), where=hess > 0.0)
+            s = np.clip(s - step, 0.0, self.stot)
+            if np.all(np.abs(step) < 1e-9 * max(self.stot, 1.0)):
+                break
+        return s
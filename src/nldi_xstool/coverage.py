@@ -0,0 +1,402 @@
+"""Local index of 3DEP coverage for resolution-availability queries.
+
+The coverage polygons of each 3DEPElevationIndex layer are downloaded, or
+imported from a file, once and kept in a GeoPackage in the cache directory.
+Availability queries are then answered in-process by polygon intersection
+with an STRtree instead of one REST round trip per layer.
+"""
+import os
+import threading
+import time
+import warnings
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import requests
+import shapely
+
+from nldi_xstool.cache import cache_dir
+from nldi_xstool.transform import OUT_CRS
+from nldi_xstool.transport import get_transport
+
+INDEX_URL = (
+    "https://index.nationalmap.gov/arcgis/rest/services/3DEPElevationIndex/MapServer"
+)
+
+# Resolution types and their respective IDs for the Rest Service
+res_types = {
+    "res_1m": 18,
+    "res_3m": 19,
+    "res_5m": 20,
+    "res_10m": 21,
+    "res_30m": 22,
+    "res_60m": 23,
+}
+
+BBox = Tuple[float, float, float, float]
+
+
+def coverage_path() -> Path:
+    """Get the path of the local coverage index.
+
+    The path is taken from the ``NLDI_XSTOOL_COVERAGE`` environment variable
+    and defaults to ``cache_dir() / "dem_coverage.gpkg"``.
+
+    Returns:
+        Path: GeoPackage of the coverage index.
+    """
+    path = os.environ.get("NLDI_XSTOOL_COVERAGE")
+    if path:
+        return Path(path)
+    return cache_dir() / "dem_coverage.gpkg"
+
+
+class CoverageIndex:
+    """CoverageIndex class.
+
+    Coverage polygons of each DEM resolution, in geographic coordinates, with
+    one STRtree per resolution for intersection queries.
+    """
+
+    def __init__(
+        self: "CoverageIndex",
+        coverage: gpd.GeoDataFrame,
+        res_col: str = "res_type",
+        built: Optional[float] = None,
+    ) -> None:
+        """Init CoverageIndex.
+
+        Args:
+            coverage (gpd.GeoDataFrame): Coverage polygons with a column naming
+                the resolution key, for example "res_1m", of each.
+            res_col (str): Name of the resolution column. Defaults to "res_type".
+            built (Optional[float]): Time the coverage was downloaded or
+                imported, in seconds since the epoch. Defaults to now.
+        """
+        self.built = time.time() if built is None else float(built)
+        if coverage.crs is not None:
+            coverage = coverage.to_crs(OUT_CRS)
+        self.coverage = gpd.GeoDataFrame(
+            {"res_type": coverage[res_col].astype(str).to_numpy()},
+            geometry=coverage.geometry.to_numpy(),
+            crs=OUT_CRS,
+        )
+        self.trees: Dict[str, shapely.STRtree] = {
+            str(res_type): shapely.STRtree(group.geometry.to_numpy())
+            for res_type, group in self.coverage.groupby("res_type")
+        }
+
+    @classmethod
+    def read(
+        cls: "type[CoverageIndex]",
+        path: Union[str, Path],
+        layer: Optional[str] = None,
+        res_col: str = "res_type",
+    ) -> "CoverageIndex":
+        """Read a coverage index, or import coverage polygons, from a file.
+
+        The build time is read from the "built" column written by write, and
+        is now for files without one.
+
+        Args:
+            path (Union[str, Path]): GeoPackage or other OGR file.
+            layer (Optional[str]): Layer of a multi-layer file. Defaults to None.
+            res_col (str): Name of the resolution column. Defaults to "res_type".
+
+        Returns:
+            CoverageIndex: Coverage index.
+        """
+        coverage = gpd.read_file(path, layer=layer)
+        built = None
+        if "built" in coverage and len(coverage):
+            built = float(coverage["built"].max())
+        return cls(coverage, res_col=res_col, built=built)
+
+    def write(self: "CoverageIndex", path: Union[str, Path]) -> None:
+        """Write the coverage index, and its build time, to a GeoPackage.
+
+        Args:
+            path (Union[str, Path]): GeoPackage written.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.gpkg")
+        self.coverage.assign(built=self.built).to_file(tmp, driver="GPKG")
+        os.replace(tmp, path)
+
+    @classmethod
+    def download(
+        cls: "type[CoverageIndex]",
+        layers: Mapping[str, int],
+        max_offset: float = 0.0005,
+        chunk: int = 200,
+    ) -> "CoverageIndex":
+        """Download the coverage polygons of 3DEPElevationIndex layers.
+
+        Args:
+            layers (Mapping[str, int]): Map service layer id of each resolution
+                key.
+            max_offset (float): Generalization tolerance of the polygons, in
+                degrees. Defaults to 0.0005.
+            chunk (int): Polygons fetched per request. Defaults to 200.
+
+        Raises:
+            RequestException: A request failed.
+
+        Returns:
+            CoverageIndex: Coverage index of the layers.
+        """
+        transport = get_transport()
+        id_queries = [
+            (
+                f"{INDEX_URL}/{layer}/query",
+                {"where": "1=1", "returnIdsOnly": "true", "f": "json"},
+            )
+            for layer in layers.values()
+        ]
+        queries = []
+        keys: List[str] = []
+        for res_type, resp in zip(layers, transport.get_json_many(id_queries)):
+            if isinstance(resp, Exception):
+                raise resp
+            ids = sorted(resp.get("objectIds") or [])
+            for i in range(0, len(ids), chunk):
+                queries.append(
+                    (
+                        f"{INDEX_URL}/{layers[res_type]}/query",
+                        {
+                            "objectIds": ",".join(str(v) for v in ids[i : i + chunk]),
+                            "returnGeometry": "true",
+                            "outSR": "4326",
+                            "maxAllowableOffset": str(max_offset),
+                            "f": "geojson",
+                        },
+                    )
+                )
+                keys.append(res_type)
+        frames = []
+        for res_type, resp in zip(keys, transport.get_json_many(queries)):
+            if isinstance(resp, Exception):
+                raise resp
+            features = resp.get("features") or []
+            if features:
+                gdf = gpd.GeoDataFrame.from_features(features, crs=OUT_CRS)
+                frames.append(
+                    gpd.GeoDataFrame(
+                        {"res_type": [res_type] * len(gdf)},
+                        geometry=shapely.make_valid(gdf.geometry.to_numpy()),
+                        crs=OUT_CRS,
+                    )
+                )
+        if not frames:
+            return cls(gpd.GeoDataFrame({"res_type": []}, geometry=[], crs=OUT_CRS))
+        return cls(pd.concat(frames, ignore_index=True))
+
+    def query(
+        self: "CoverageIndex", bbox: BBox, res_types: Sequence[str]
+    ) -> Dict[str, bool]:
+        """Get which resolutions have coverage intersecting bbox.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy) in geographic coordinates.
+            res_types (Sequence[str]): Resolution keys to check.
+
+        Returns:
+            Dict[str, bool]: True where the resolution covers part of bbox.
+        """
+        box = shapely.box(*bbox)
+        return {
+            res_type: res_type in self.trees
+            and self.trees[res_type].query(box, predicate="intersects").size > 0
+            for res_type in res_types
+        }
+
+    def covers(
+        self: "CoverageIndex", bbox: BBox, res_types: Sequence[str]
+    ) -> Dict[str, bool]:
+        """Get which resolutions have coverage covering all of bbox.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy) in geographic coordinates.
+            res_types (Sequence[str]): Resolution keys to check.
+
+        Returns:
+            Dict[str, bool]: True where the union of the resolution's coverage
+                polygons covers bbox.
+        """
+        box = shapely.box(*bbox)
+        out = {}
+        for res_type in res_types:
+            tree = self.trees.get(res_type)
+            geoms = []
+            if tree is not None:
+                geoms = tree.geometries.take(tree.query(box, predicate="intersects"))
+            out[res_type] = _covers(geoms, box)
+        return out
+
+    def query_many(
+        self: "CoverageIndex", bboxes: Sequence[BBox], res_types: Sequence[str]
+    ) -> pd.DataFrame:
+        """Get which resolutions have coverage intersecting each of many bboxes.
+
+        Args:
+            bboxes (Sequence[BBox]): (minx, miny, maxx, maxy) of each site.
+            res_types (Sequence[str]): Resolution keys to check.
+
+        Returns:
+            pd.DataFrame: Availability matrix, one row per bbox and one
+                boolean column per resolution key.
+        """
+        bounds = np.asarray(bboxes, dtype=np.double).reshape(-1, 4)
+        boxes = shapely.box(bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3])
+        columns = {}
+        for res_type in res_types:
+            hit = np.zeros(len(boxes), dtype=bool)
+            if res_type in self.trees:
+                hit[self.trees[res_type].query(boxes, predicate="intersects")[0]] = True
+            columns[res_type] = pd.array(hit, dtype="boolean")
+        return pd.DataFrame(columns)
+
+
+def _covers(geoms: Sequence[shapely.Geometry], box: shapely.Geometry) -> bool:
+    """Whether the union of geoms covers box."""
+    if len(geoms) == 0:
+        return False
+    return bool(shapely.union_all(shapely.make_valid(np.asarray(geoms))).covers(box))
+
+
+_index: Optional[CoverageIndex] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def _max_age() -> Optional[float]:
+    """NLDI_XSTOOL_COVERAGE_MAX_AGE in seconds, None when unset or invalid."""
+    max_age = os.environ.get("NLDI_XSTOOL_COVERAGE_MAX_AGE")
+    if not max_age:
+        return None
+    try:
+        return float(max_age)
+    except ValueError:
+        warnings.warn(
+            f"ignoring invalid NLDI_XSTOOL_COVERAGE_MAX_AGE {max_age!r}, expected "
+            "seconds",
+            stacklevel=4,
+        )
+        return None
+
+
+def _read_index(path: Path) -> Optional[CoverageIndex]:
+    """Read the index at path, None with a warning when unusable."""
+    try:
+        index = CoverageIndex.read(path)
+    except Exception as ex:
+        warnings.warn(
+            f"unable to read coverage index {path}, querying the 3DEPElevationIndex "
+            f"instead; rebuild it with nldi-xstool refresh-coverage: {ex}",
+            stacklevel=3,
+        )
+        return None
+    max_age = _max_age()
+    if max_age is not None and time.time() - index.built > max_age:
+        warnings.warn(
+            f"coverage index {path} is older than {max_age} s, querying the "
+            "3DEPElevationIndex instead; rebuild it with nldi-xstool refresh-coverage",
+            stacklevel=3,
+        )
+        return None
+    return index
+
+
+def get_coverage_index() -> Optional[CoverageIndex]:
+    """Get the process-wide coverage index.
+
+    An index older than the ``NLDI_XSTOOL_COVERAGE_MAX_AGE`` environment
+    variable, in seconds, or that cannot be read is ignored with a warning.
+
+    Returns:
+        Optional[CoverageIndex]: Index read from coverage_path(), or None when
+            it has not been downloaded or is unusable.
+    """
+    global _index, _loaded
+    with _lock:
+        if not _loaded:
+            path = coverage_path()
+            _index = _read_index(path) if path.exists() else None
+            _loaded = True
+        return _index
+
+
+def set_coverage_index(index: Optional[CoverageIndex]) -> None:
+    """Replace the process-wide coverage index.
+
+    Args:
+        index (Optional[CoverageIndex]): Index to use, None to query the REST
+            service.
+    """
+    global _index, _loaded
+    with _lock:
+        _index = index
+        _loaded = True
+
+
+def query_covers(bbox: BBox) -> Dict[str, bool]:
+    """Get which resolutions of res_types have coverage covering all of bbox.
+
+    Answered from the process-wide coverage index when it has been downloaded,
+    else from the coverage polygons intersecting bbox, fetched from the
+    3DEPElevationIndex one layer per concurrent request.
+
+    Args:
+        bbox (BBox): (minx, miny, maxx, maxy) in geographic coordinates.
+
+    Raises:
+        RequestException: A request failed or the service returned an error.
+
+    Returns:
+        Dict[str, bool]: True where the union of the resolution's coverage
+            polygons covers bbox.
+    """
+    index = get_coverage_index()
+    if index is not None:
+        return index.covers(bbox, list(res_types))
+    envelope = ",".join(str(v) for v in bbox)
+    queries = [
+        (
+            f"{INDEX_URL}/{layer}/query",
+            {
+                "geometry": envelope,
+                "geometryType": "esriGeometryEnvelope",
+                "inSR": "4326",
+                "spatialRel": "esriSpatialRelIntersects",
+                "returnGeometry": "true",
+                "outSR": "4326",
+                "maxAllowableOffset": "0.0005",
+                "f": "geojson",
+            },
+        )
+        for layer in res_types.values()
+    ]
+    box = shapely.box(*bbox)
+    out = {}
+    for res_type, resp in zip(res_types, get_transport().get_json_many(queries)):
+        if isinstance(resp, Exception):
+            raise resp
+        if "error" in resp:
+            raise requests.HTTPError(f"3DEPElevationIndex error: {resp['error']}")
+        geoms = [
+            shapely.geometry.shape(feature["geometry"])
+            for feature in resp.get("features") or []
+            if feature.get("geometry")
+        ]
+        out[res_type] = _covers(geoms, box)
+    return out
@@ -0,0 +1,181 @@
+"""Process-level in-memory store of fetched DEM rasters.
+
+Rasters are indexed by their extent in an STRtree so a request whose bounding
+box falls inside a raster already in memory is answered by slicing that raster,
+without touching the disk cache or the network.
+"""
+import threading
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+import xarray as xr
+from shapely import box
+from shapely import STRtree
+
+BBox = Tuple[float, float, float, float]
+
+
+class _Entry:
+    """A raster held in the store."""
+
+    def __init__(self: "_Entry", dem: xr.DataArray, res: int, crs: str) -> None:
+        self.dem = dem
+        self.res = res
+        self.crs = crs.lower()
+        self.nbytes = int(dem.nbytes)
+        x = dem.x.values
+        y = dem.y.values
+        self.extent = box(x.min(), y.min(), x.max(), y.max())
+        self.hits = 0
+        self.last_used = 0
+
+    def value(self: "_Entry") -> float:
+        """Hits per byte held, used to pick eviction victims."""
+        return (1.0 + self.hits) / max(self.nbytes, 1)
+
+
+def window(dem: xr.DataArray, bbox: BBox) -> xr.DataArray:
+    """Slice a DEM to bbox, keeping one pixel of margin for interpolation.
+
+    Args:
+        dem (xr.DataArray): DEM with x and y coordinates.
+        bbox (BBox): (minx, miny, maxx, maxy).
+
+    Returns:
+        xr.DataArray: View of dem covering bbox.
+    """
+    x = dem.x.values
+    y = dem.y.values
+    dx = np.abs(x[1] - x[0]) if x.size > 1 else 0.0
+    dy = np.abs(y[1] - y[0]) if y.size > 1 else 0.0
+    ix = np.nonzero((x >= bbox[0] - dx) & (x <= bbox[2] + dx))[0]
+    iy = np.nonzero((y >= bbox[1] - dy) & (y <= bbox[3] + dy))[0]
+    return dem.isel(x=slice(ix[0], ix[-1] + 1), y=slice(iy[0], iy[-1] + 1))
+
+
+class DEMStore:
+    """DEMStore class.
+
+    Thread-safe in-memory store of DEM DataArrays with an R-tree over their
+    extents. Memory held is capped; when the cap is exceeded the rasters with
+    the fewest hits per byte are evicted first, least recently used breaking
+    ties.
+    """
+
+    def __init__(self: "DEMStore", max_bytes: int = 512 * 1024**2) -> None:
+        """Init DEMStore.
+
+        Args:
+            max_bytes (int): Memory cap in bytes. Defaults to 512 MiB.
+        """
+        self.max_bytes = max_bytes
+        self.entries: List[_Entry] = []
+        self._tree: Optional[STRtree] = None
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _index(self: "DEMStore") -> STRtree:
+        if self._tree is None:
+            self._tree = STRtree([e.extent for e in self.entries])
+        return self._tree
+
+    def get(self: "DEMStore", bbox: BBox, res: int, crs: str) -> Optional[xr.DataArray]:
+        """Get a window of a stored DEM covering bbox.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy).
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of bbox.
+
+        Returns:
+            Optional[xr.DataArray]: Sub-window of a stored DEM, or None when no
+                stored DEM of the same resolution and CRS covers bbox.
+        """
+        crs = crs.lower()
+        with self._lock:
+            if self.entries:
+                query = box(*bbox)
+                # smallest covering raster gives the tightest window
+                for idx in sorted(
+                    self._index().query(query, predicate="covered_by"),
+                    key=lambda i: self.entries[i].nbytes,
+                ):
+                    entry = self.entries[idx]
+                    if entry.res == res and entry.crs == crs:
+                        self._clock += 1
+                        entry.hits += 1
+                        entry.last_used = self._clock
+                        self.hits += 1
+                        return window(entry.dem, bbox)
+            self.misses += 1
+        return None
+
+    def add(self: "DEMStore", dem: xr.DataArray, res: int, crs: str) -> None:
+        """Add a DEM to the store.
+
+        Stored DEMs of the same resolution and CRS lying entirely inside the new
+        one are dropped as redundant.
+
+        Args:
+            dem (xr.DataArray): DEM to store.
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of DEM.
+        """
+        entry = _Entry(dem, res, crs)
+        with self._lock:
+            self._clock += 1
+            entry.last_used = self._clock
+            self.entries = [
+                e
+                for e in self.entries
+                if not (
+                    e.res == entry.res
+                    and e.crs == entry.crs
+                    and entry.extent.covers(e.extent)
+                )
+            ]
+            self.entries.append(entry)
+            self._evict(keep=entry)
+            self._tree = None
+
+    def _evict(self: "DEMStore", keep: _Entry) -> None:
+        total = sum(e.nbytes for e in self.entries)
+        if total <= self.max_bytes:
+            return
+        for victim in sorted(self.entries, key=lambda e: (e.value(), e.last_used)):
+            if total <= self.max_bytes:
+                break
+            if victim is keep:
+                continue
+            self.entries.remove(victim)
+            total -= victim.nbytes
+
+    def size(self: "DEMStore") -> int:
+        """Get memory held by stored DEMs.
+
+        Returns:
+            int: Size in bytes.
+        """
+        return sum(e.nbytes for e in self.entries)
+
+    def clear(self: "DEMStore") -> None:
+        """Remove all stored DEMs."""
+        with self._lock:
+            self.entries = []
+            self._tree = None
+
+
+_dem_store = DEMStore()
+
+
+def get_dem_store() -> DEMStore:
+    """Get the process-wide DEM store.
+
+    Returns:
+        DEMStore: Shared in-memory DEM store.
+    """
+    return _dem_store
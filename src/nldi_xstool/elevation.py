@@ -0,0 +1,316 @@
+"""Elevation sources used to sample cross-sections.
+
+An elevation source returns a DEM covering a bounding box, or a corridor
+along cross-section lines. ThreeDEPSource requests it from the 3DEP service
+through the in-memory store and the on-disk cache, LocalRasterSource reads it
+from local GeoTIFF, VRT or COG files.
+"""
+import math
+import os
+from abc import ABC
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+import rasterio
+import shapely
+import xarray as xr
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import from_bounds
+from rasterio.windows import Window
+from shapely import STRtree
+from shapely.geometry.base import BaseGeometry
+
+from nldi_xstool.cache import DEMCache
+from nldi_xstool.cache import FETCH_MARGIN
+from nldi_xstool.cache import get_dem_cache
+from nldi_xstool.demstore import DEMStore
+from nldi_xstool.demstore import get_dem_store
+from nldi_xstool.sampler import DEMMosaic
+
+BBox = Tuple[float, float, float, float]
+
+
+def corridor_tiles(
+    lines: Sequence[BaseGeometry], buffer: float, step: float
+) -> List[BBox]:
+    """Get the cells of a grid a buffered corridor along lines passes through.
+
+    Args:
+        lines (Sequence[BaseGeometry]): Lines, such as cross-sections.
+        buffer (float): Half-width of the corridor.
+        step (float): Size of the grid cells.
+
+    Returns:
+        List[BBox]: Bounding boxes of the cells.
+    """
+    corridor = shapely.buffer(np.asarray(lines, dtype=object), buffer)
+    bounds = shapely.total_bounds(corridor)
+    i0, j0 = math.floor(bounds[0] / step), math.floor(bounds[1] / step)
+    i1, j1 = math.ceil(bounds[2] / step), math.ceil(bounds[3] / step)
+    ii, jj = np.meshgrid(np.arange(i0, i1), np.arange(j0, j1), indexing="ij")
+    ii, jj = ii.ravel(), jj.ravel()
+    cells = shapely.box(ii * step, jj * step, (ii + 1) * step, (jj + 1) * step)
+    _line, hit = STRtree(cells).query(corridor, predicate="intersects")
+    return [
+        (ii[k] * step, jj[k] * step, (ii[k] + 1) * step, (jj[k] + 1) * step)
+        for k in np.unique(hit)
+    ]
+
+
+class ElevationSource(ABC):
+    """Base class of elevation sources."""
+
+    def get_corridor(
+        self: "ElevationSource",
+        lines: Sequence[BaseGeometry],
+        res: int,
+        crs: str,
+        buffer: Optional[float] = None,
+    ) -> Union[xr.DataArray, DEMMosaic]:
+        """Get DEM covering a corridor along lines.
+
+        The base implementation gets one DEM covering the bounding box of the
+        corridor.
+
+        Args:
+            lines (Sequence[BaseGeometry]): Lines to sample, in crs.
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of lines and of returned DEM.
+            buffer (Optional[float]): Half-width of the corridor. Defaults to
+                3 pixels, enough for bicubic sampling.
+
+        Returns:
+            Union[xr.DataArray, DEMMosaic]: DEM covering the corridor.
+        """
+        if buffer is None:
+            buffer = 3.0 * res
+        corridor = shapely.buffer(np.asarray(lines, dtype=object), buffer)
+        return self.get_dem(tuple(shapely.total_bounds(corridor)), res, crs)
+
+    @abstractmethod
+    def get_dem(
+        self: "ElevationSource", bbox: BBox, res: int, crs: str
+    ) -> xr.DataArray:
+        """Get DEM covering bbox.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy) in crs.
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of bbox and of returned DEM.
+
+        Returns:
+            xr.DataArray: DEM covering bbox.
+        """
+
+
+class ThreeDEPSource(ElevationSource):
+    """Elevation from the 3DEP service.
+
+    Requests are answered from the in-memory DEM store, then the on-disk DEM
+    cache, and only downloaded from 3DEP when both miss. Corridors are fetched
+    as the tiles of a grid sized to the corridor they pass through,
+    concurrently.
+    """
+
+    def __init__(
+        self: "ThreeDEPSource",
+        store: Optional[DEMStore] = None,
+        cache: Optional[DEMCache] = None,
+        max_workers: int = 8,
+    ) -> None:
+        """Init ThreeDEPSource.
+
+        Args:
+            store (Optional[DEMStore]): In-memory store, defaults to the
+                process-wide store.
+            cache (Optional[DEMCache]): On-disk cache, defaults to the
+                process-wide cache.
+            max_workers (int): Number of corridor tiles fetched at once.
+                Defaults to 8.
+        """
+        self.store = store
+        self.cache = cache
+        self.max_workers = max_workers
+
+    def get_dem(self: "ThreeDEPSource", bbox: BBox, res: int, crs: str) -> xr.DataArray:
+        """Get DEM covering bbox.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy) in crs.
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of bbox and of returned DEM.
+
+        Returns:
+            xr.DataArray: DEM covering bbox.
+        """
+        return self._get_tile(bbox, res, crs)
+
+    def _get_tile(
+        self: "ThreeDEPSource",
+        bbox: BBox,
+        res: int,
+        crs: str,
+        tile_pixels: Optional[int] = None,
+    ) -> xr.DataArray:
+        store = self.store if self.store is not None else get_dem_store()
+        dem = store.get(bbox, res, crs)
+        if dem is None:
+            cache = self.cache if self.cache is not None else get_dem_cache()
+            dem = cache.fetch(bbox, res, crs, tile_pixels)
+            store.add(dem, res, crs)
+        return dem
+
+    def get_corridor(
+        self: "ThreeDEPSource",
+        lines: Sequence[BaseGeometry],
+        res: int,
+        crs: str,
+        buffer: Optional[float] = None,
+    ) -> Union[xr.DataArray, DEMMosaic]:
+        """Get DEM covering a corridor along lines.
+
+        Only the tiles of a grid the corridor passes through are fetched, and
+        they are sampled as a lazy mosaic. Tiles are a few corridor widths on
+        a side, but no smaller than twice the margin every 3DEP request is
+        padded with, which minimizes the pixels transferred.
+
+        Args:
+            lines (Sequence[BaseGeometry]): Lines to sample, in crs.
+            res (int): Resolution of DEM in meters.
+            crs (str): CRS of lines and of returned DEM.
+            buffer (Optional[float]): Half-width of the corridor. Defaults to
+                3 pixels, enough for bicubic sampling.
+
+        Returns:
+            Union[xr.DataArray, DEMMosaic]: DEM covering the corridor.
+        """
+        if buffer is None:
+            buffer = 3.0 * res
+        tile_pixels = max(2 * FETCH_MARGIN, math.ceil(4.0 * buffer / res))
+        step = float(tile_pixels * res)
+        # shrink the cells so snapping to the grid cannot grow them
+        tiles = [
+            (b[0] + res / 2.0, b[1] + res / 2.0, b[2] - res / 2.0, b[3] - res / 2.0)
+            for b in corridor_tiles(lines, buffer, step)
+        ]
+        workers = max(1, min(self.max_workers, len(tiles)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            dems = list(
+                pool.map(
+                    lambda bbox: self._get_tile(bbox, res, crs, tile_pixels), tiles
+                )
+            )
+        return DEMMosaic(dems, step)
+
+
+class LocalRasterSource(ElevationSource):
+    """Elevation from local GeoTIFF, VRT or COG files.
+
+    Only the window of pixels around the requested bounding box is read. The
+    first file covering the bounding box is used, so a mosaic spread over many
+    files is best given as a single VRT. Files in another CRS are warped on the
+    fly. Pixels are read at the file's native resolution; the requested
+    resolution is ignored.
+    """
+
+    def __init__(self: "LocalRasterSource", paths: Sequence[Union[str, Path]]) -> None:
+        """Init LocalRasterSource.
+
+        Args:
+            paths (Sequence[Union[str, Path]]): Raster files to read from.
+        """
+        self.paths: List[str] = [str(p) for p in paths]
+
+    def get_dem(
+        self: "LocalRasterSource", bbox: BBox, res: int, crs: str
+    ) -> xr.DataArray:
+        """Get DEM covering bbox.
+
+        Args:
+            bbox (BBox): (minx, miny, maxx, maxy) in crs.
+            res (int): Ignored, pixels are read at native resolution.
+            crs (str): CRS of bbox and of returned DEM.
+
+        Raises:
+            LookupError: No file covers bbox.
+
+        Returns:
+            xr.DataArray: DEM covering bbox.
+        """
+        for path in self.paths:
+            with rasterio.open(path) as src:
+                if src.crs == CRS.from_user_input(crs):
+                    dem = _read_window(src, bbox)
+                else:
+                    with WarpedVRT(src, crs=crs, resampling=Resampling.bilinear) as vrt:
+                        dem = _read_window(vrt, bbox)
+            if dem is not None:
+                return dem
+        raise LookupError(f"No local DEM covers {bbox} in {crs}")
+
+
+def _read_window(
+    src: rasterio.io.DatasetReaderBase, bbox: BBox
+) -> Optional[xr.DataArray]:
+    """Read the pixels of src covering bbox, with one pixel of margin."""
+    left, bottom, right, top = src.bounds
+    if bbox[0] < left or bbox[1] < bottom or bbox[2] > right or bbox[3] > top:
+        return None
+    win = from_bounds(*bbox, transform=src.transform)
+    col0 = max(int(np.floor(win.col_off)) - 1, 0)
+    row0 = max(int(np.floor(win.row_off)) - 1, 0)
+    col1 = min(int(np.ceil(win.col_off + win.width)) + 1, src.width)
+    row1 = min(int(np.ceil(win.row_off + win.height)) + 1, src.height)
+    win = Window(col0, row0, col1 - col0, row1 - row0)
+    data = src.read(1, window=win, masked=True).astype(np.double).filled(np.nan)
+    transform = src.window_transform(win)
+    x = transform.c + (np.arange(data.shape[1]) + 0.5) * transform.a
+    y = transform.f + (np.arange(data.shape[0]) + 0.5) * transform.e
+    return xr.DataArray(
+        data,
+        coords={"y": y, "x": x},
+        dims=("y", "x"),
+        name="elevation",
+        attrs={"crs": src.crs.to_string(), "nodatavals": (np.nan,)},
+    )
+
+
+_source: Optional[ElevationSource] = None
+
+
+def get_elevation_source() -> ElevationSource:
+    """Get the process-wide elevation source.
+
+    A LocalRasterSource is used when the ``NLDI_XSTOOL_DEM_PATH`` environment
+    variable lists raster files (separated by ``os.pathsep``), otherwise 3DEP.
+
+    Returns:
+        ElevationSource: Shared elevation source.
+    """
+    global _source
+    if _source is None:
+        paths = os.environ.get("NLDI_XSTOOL_DEM_PATH")
+        if paths:
+            _source = LocalRasterSource(paths.split(os.pathsep))
+        else:
+            _source = ThreeDEPSource()
+    return _source
+
+
+def set_elevation_source(source: ElevationSource) -> None:
+    """Replace the process-wide elevation source.
+
+    Args:
+        source (ElevationSource): Elevation source to use.
+    """
+    global _source
+    _source = source
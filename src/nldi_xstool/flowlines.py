@@ -0,0 +1,495 @@
+"""Resolve COMIDs and NHDPlus flowline geometries for points of interest."""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
+import requests
+from pynhd import NLDI
+from pynhd import WaterData
+from shapely import force_2d
+from shapely import from_wkb
+from shapely import line_merge
+from shapely import points
+from shapely import STRtree
+from shapely import to_wkb
+from shapely.geometry import Point
+
+from nldi_xstool.cache import cache_dir
+from nldi_xstool.transform import OUT_CRS
+from nldi_xstool.transform import transform
+from nldi_xstool.transform import WORK_CRS
+from nldi_xstool.transport import get_transport
+
+NLDI_POSITION_URL = (
+    "https://labs.waterdata.usgs.gov/api/nldi/linked-data/comid/position?f=json&coords="
+)
+
+
+def get_cid_from_lonlat(lon: float, lat: float) -> str:
+    """Get the COMID of the catchment containing a point from the NLDI.
+
+    Args:
+        lon (float): Longitude of point.
+        lat (float): Latitude of point.
+
+    Raises:
+        err: Request to the NLDI failed.
+        ex: Any other error.
+
+    Returns:
+        str: COMID.
+    """
+    location = f"POINT({lon} {lat})"
+    url = NLDI_POSITION_URL + location
+    try:
+        jres = get_transport().get_json(url)
+        comid = jres["features"][0]["properties"]["comid"]
+
+    except requests.exceptions.RequestException as err:  # pragma: no cover
+        print("OOps: Something Else", err)
+        raise err
+    except Exception as ex:  # pragma: no cover
+        raise ex
+
+    return str(comid)
+
+
+class FlowlineStore:
+    """FlowlineStore class.
+
+    SQLite store of NHDPlus flowline geometries keyed by COMID. Geometries are
+    stored already projected, so a repeat request on a reach costs a local read
+    instead of an NLDI round trip and a reprojection. Rows older than ttl, or
+    written for a different NHDPlus version, are treated as missing.
+    """
+
+    def __init__(
+        self: "FlowlineStore",
+        path: Optional[Union[str, Path]] = None,
+        crs: str = WORK_CRS,
+        ttl: Optional[float] = None,
+        nhdplus_version: str = "NHDPlusV2.1",
+    ) -> None:
+        """Init FlowlineStore.
+
+        Args:
+            path (Optional[Union[str, Path]]): SQLite file. Defaults to
+                ``cache_dir() / "flowlines.sqlite"``.
+            crs (str): CRS geometries are stored in. Defaults to WORK_CRS.
+            ttl (Optional[float]): Age in seconds after which a row is refetched,
+                None to keep rows until the version changes. Defaults to None.
+            nhdplus_version (str): NHDPlus version of the flowlines; rows stored
+                for another version are refetched. Defaults to "NHDPlusV2.1".
+        """
+        self.path = Path(path) if path is not None else cache_dir() / "flowlines.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.crs = crs
+        self.ttl = ttl
+        self.nhdplus_version = nhdplus_version
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS flowlines ("
+                "comid TEXT NOT NULL, crs TEXT NOT NULL, version TEXT NOT NULL, "
+                "fetched REAL NOT NULL, geom BLOB NOT NULL, PRIMARY KEY (comid, crs))"
+            )
+
+    def _connect(self: "FlowlineStore") -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30.0)
+
+    def _frame(
+        self: "FlowlineStore", comids: List[str], geoms: List[bytes]
+    ) -> gpd.GeoDataFrame:
+        return gpd.GeoDataFrame(
+            {"comid": comids}, geometry=list(from_wkb(geoms)), crs=self.crs
+        )
+
+    def get(self: "FlowlineStore", comid: str) -> Optional[gpd.GeoDataFrame]:
+        """Get a stored flowline.
+
+        Args:
+            comid (str): NHDPlus COMID.
+
+        Returns:
+            Optional[gpd.GeoDataFrame]: Flowline in the store's crs, or None if it
+                is missing or stale.
+        """
+        with closing(self._connect()) as con, con:
+            row = con.execute(
+                "SELECT version, fetched, geom FROM flowlines WHERE comid=? AND crs=?",
+                (str(comid), self.crs.lower()),
+            ).fetchone()
+        if row is None or row[0] != self.nhdplus_version:
+            return None
+        if self.ttl is not None and time.time() - row[1] > self.ttl:
+            return None
+        return self._frame([str(comid)], [row[2]])
+
+    def put(self: "FlowlineStore", flowlines: gpd.GeoDataFrame) -> None:
+        """Store flowlines.
+
+        Args:
+            flowlines (gpd.GeoDataFrame): Flowlines with a comid column.
+        """
+        if flowlines.crs != self.crs:
+            flowlines = flowlines.to_crs(self.crs)
+        now = time.time()
+        rows = [
+            (str(c), self.crs.lower(), self.nhdplus_version, now, g)
+            for c, g in zip(flowlines["comid"], to_wkb(flowlines.geometry.values))
+        ]
+        with closing(self._connect()) as con, con:
+            con.executemany("INSERT OR REPLACE INTO flowlines VALUES (?,?,?,?,?)", rows)
+
+    def fetch(self: "FlowlineStore", comid: str) -> gpd.GeoDataFrame:
+        """Get a flowline from the store, requesting it from the NLDI if missing.
+
+        Args:
+            comid (str): NHDPlus COMID.
+
+        Returns:
+            gpd.GeoDataFrame: Flowline in the store's crs.
+        """
+        flowline = self.get(comid)
+        if flowline is None:
+            flowline = NLDI().getfeature_byid("comid", comid).to_crs(self.crs)
+            flowline["comid"] = str(comid)
+            self.put(flowline)
+        return flowline
+
+    def preload_huc(self: "FlowlineStore", huc: str) -> int:
+        """Store every flowline in a hydrologic unit.
+
+        Flowlines are selected on their reachcode, which starts with the HUC8
+        they lie in, so huc may be a HUC2 through HUC8.
+
+        Args:
+            huc (str): Hydrologic unit code of 2 to 8 digits.
+
+        Raises:
+            ValueError: huc is not 2 to 8 digits.
+
+        Returns:
+            int: Number of flowlines stored.
+        """
+        if not (huc.isdigit() and 2 <= len(huc) <= 8):
+            raise ValueError(f"huc must be a HUC2 to HUC8 code, got {huc}")
+        flowlines = WaterData("nhdflowline_network").byfilter(
+            f"reachcode LIKE '{huc}%'"
+        )
+        self.put(flowlines[["comid", "geometry"]])
+        return len(flowlines)
+
+    def invalidate(self: "FlowlineStore", comid: Optional[str] = None) -> None:
+        """Remove a stored flowline, or all of them.
+
+        Args:
+            comid (Optional[str]): COMID to remove, None removes all.
+        """
+        with closing(self._connect()) as con, con:
+            if comid is None:
+                con.execute("DELETE FROM flowlines")
+            else:
+                con.execute("DELETE FROM flowlines WHERE comid=?", (str(comid),))
+
+
+_store: Optional[FlowlineStore] = None
+
+
+def get_flowline_store() -> FlowlineStore:
+    """Get the process-wide flowline store.
+
+    Returns:
+        FlowlineStore: Shared flowline store.
+    """
+    global _store
+    if _store is None:
+        _store = FlowlineStore()
+    return _store
+
+
+def set_flowline_store(store: FlowlineStore) -> None:
+    """Replace the process-wide flowline store.
+
+    Args:
+        store (FlowlineStore): Flowline store to use.
+    """
+    global _store
+    _store = store
+
+
+class ComidResolver:
+    """ComidResolver class.
+
+    Spatial memoization of COMID lookups. Each resolved flowline is kept,
+    projected, in an STRtree; a later point lying within tolerance of exactly
+    one known flowline is answered locally. Points near no known flowline, or
+    near more than one (for example at a confluence), fall back to the NLDI.
+    """
+
+    def __init__(
+        self: "ComidResolver",
+        tolerance: float = 25.0,
+        crs: str = WORK_CRS,
+        max_flowlines: int = 10000,
+    ) -> None:
+        """Init ComidResolver.
+
+        Args:
+            tolerance (float): Distance, in crs units (meters in EPSG:5070 by
+                default), within which a point is matched to a known flowline.
+                Defaults to 25.0.
+            crs (str): CRS flowlines are held in. Defaults to WORK_CRS.
+            max_flowlines (int): Number of flowlines kept, least recently used
+                are dropped first. Defaults to 10000.
+        """
+        self.tolerance = tolerance
+        self.crs = crs
+        self.max_flowlines = max_flowlines
+        self.flowlines: "OrderedDict[str, gpd.GeoDataFrame]" = OrderedDict()
+        self._comids: List[str] = []
+        self._tree: Optional[STRtree] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _index(self: "ComidResolver") -> STRtree:
+        if self._tree is None:
+            self._comids = list(self.flowlines)
+            self._tree = STRtree(
+                [self.flowlines[c].geometry.iloc[0] for c in self._comids]
+            )
+        return self._tree
+
+    def _match(
+        self: "ComidResolver", lon: float, lat: float
+    ) -> Optional[Tuple[str, gpd.GeoDataFrame]]:
+        """Match a point to one known flowline, counting hits and misses."""
+        with self._lock:
+            match = None
+            if self.flowlines:
+                pt = Point(*transform(lon, lat, OUT_CRS, self.crs))
+                idx = self._index().query(
+                    pt, predicate="dwithin", distance=self.tolerance
+                )
+                if len(idx) == 1:
+                    comid = self._comids[idx[0]]
+                    self.flowlines.move_to_end(comid)
+                    match = comid, self.flowlines[comid]
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return match
+
+    def _add(self: "ComidResolver", comid: str, flowline: gpd.GeoDataFrame) -> None:
+        with self._lock:
+            self.flowlines[comid] = flowline
+            self.flowlines.move_to_end(comid)
+            while len(self.flowlines) > self.max_flowlines:
+                self.flowlines.popitem(last=False)
+            self._tree = None
+
+    def flowline(self: "ComidResolver", comid: str) -> gpd.GeoDataFrame:
+        """Get the projected flowline geometry of a COMID.
+
+        Args:
+            comid (str): NHDPlus COMID.
+
+        Returns:
+            gpd.GeoDataFrame: Flowline in the resolver's crs.
+        """
+        with self._lock:
+            flowline = self.flowlines.get(comid)
+        if flowline is None:
+            flowline = get_flowline_store().fetch(comid)
+            if flowline.crs != self.crs:
+                flowline = flowline.to_crs(self.crs)
+            self._add(comid, flowline)
+        return flowline
+
+    def lookup(
+        self: "ComidResolver", lon: float, lat: float
+    ) -> Tuple[str, gpd.GeoDataFrame]:
+        """Get the COMID and flowline nearest a point.
+
+        Args:
+            lon (float): Longitude of point.
+            lat (float): Latitude of point.
+
+        Returns:
+            Tuple[str, gpd.GeoDataFrame]: COMID and flowline in the resolver's crs.
+        """
+        match = self._match(lon, lat)
+        if match is not None:
+            return match
+        comid = get_cid_from_lonlat(lon, lat)
+        return comid, self.flowline(comid)
+
+    def stats(self: "ComidResolver") -> Dict[str, int]:
+        """Get hit and miss counters.
+
+        Returns:
+            Dict[str, int]: Number of hits, misses and flowlines held.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "flowlines": len(self.flowlines),
+            }
+
+
+class NHDFlowlineIndex:
+    """NHDFlowlineIndex class.
+
+    Offline flowline provider. NHDPlus flowlines are loaded from a GeoPackage
+    or GeoParquet file into an STRtree and points are matched to the nearest
+    flowline, so no NLDI request is made. Note the NLDI matches a point to the
+    catchment containing it, which near confluences is not always the nearest
+    flowline.
+    """
+
+    def __init__(
+        self: "NHDFlowlineIndex",
+        path: Union[str, Path],
+        layer: Optional[str] = None,
+        comid_col: str = "comid",
+        crs: str = WORK_CRS,
+        max_distance: Optional[float] = None,
+    ) -> None:
+        """Init NHDFlowlineIndex.
+
+        Args:
+            path (Union[str, Path]): GeoPackage (or other OGR file) or GeoParquet
+                file of NHDPlus flowlines.
+            layer (Optional[str]): Layer of a multi-layer file. Defaults to None.
+            comid_col (str): Name of the COMID column, matched case-insensitively.
+                Defaults to "comid".
+            crs (str): CRS flowlines are held in. Defaults to WORK_CRS.
+            max_distance (Optional[float]): Largest distance, in crs units, at which
+                a point is matched to a flowline. Defaults to None, no limit.
+        """
+        path = Path(path)
+        if path.suffix.lower() in (".parquet", ".geoparquet"):
+            data = gpd.read_parquet(path)
+        else:
+            data = gpd.read_file(path, layer=layer)
+        col = {c.lower(): c for c in data.columns}[comid_col.lower()]
+        geoms = line_merge(force_2d(data.to_crs(crs).geometry.values))
+        self.crs = crs
+        self.max_distance = max_distance
+        self.comids = np.asarray(data[col].astype("int64").astype(str))
+        self.geoms = np.asarray(geoms)
+        self.index = {c: i for i, c in enumerate(self.comids)}
+        self.tree = STRtree(self.geoms)
+
+    def lookup_many(
+        self: "NHDFlowlineIndex",
+        lon: Union[Sequence[float], npt.NDArray[np.double]],
+        lat: Union[Sequence[float], npt.NDArray[np.double]],
+    ) -> npt.NDArray[np.object_]:
+        """Get the COMIDs of the flowlines nearest many points in one query.
+
+        Args:
+            lon (Union[Sequence[float], npt.NDArray[np.double]]): Longitudes.
+            lat (Union[Sequence[float], npt.NDArray[np.double]]): Latitudes.
+
+        Returns:
+            npt.NDArray[np.object_]: COMID of each point, None where no flowline
+                lies within max_distance.
+        """
+        x, y = transform(lon, lat, OUT_CRS, self.crs)
+        pts = points(np.atleast_1d(x), np.atleast_1d(y))
+        pidx, tidx = self.tree.query_nearest(pts, max_distance=self.max_distance)
+        result = np.full(len(pts), None, dtype=object)
+        # equidistant ties return several matches, keep the first
+        first = np.unique(pidx, return_index=True)[1]
+        result[pidx[first]] = self.comids[tidx[first]]
+        return result
+
+    def flowline(self: "NHDFlowlineIndex", comid: str) -> gpd.GeoDataFrame:
+        """Get the projected flowline geometry of a COMID.
+
+        Args:
+            comid (str): NHDPlus COMID.
+
+        Returns:
+            gpd.GeoDataFrame: Flowline in the index's crs.
+        """
+        geom = self.geoms[self.index[str(comid)]]
+        return gpd.GeoDataFrame({"comid": [str(comid)]}, geometry=[geom], crs=self.crs)
+
+    def lookup(
+        self: "NHDFlowlineIndex", lon: float, lat: float
+    ) -> Tuple[str, gpd.GeoDataFrame]:
+        """Get the COMID and flowline nearest a point.
+
+        Args:
+            lon (float): Longitude of point.
+            lat (float): Latitude of point.
+
+        Raises:
+            LookupError: No flowline within max_distance.
+
+        Returns:
+            Tuple[str, gpd.GeoDataFrame]: COMID and flowline in the index's crs.
+        """
+        comid = self.lookup_many([lon], [lat])[0]
+        if comid is None:
+            raise LookupError(f"No flowline within {self.max_distance} of {lon, lat}")
+        return comid, self.flowline(comid)
+
+
+FlowlineProvider = Union[ComidResolver, NHDFlowlineIndex]
+
+_resolver = ComidResolver()
+_provider: Optional[FlowlineProvider] = None
+
+
+def get_comid_resolver() -> ComidResolver:
+    """Get the process-wide COMID resolver.
+
+    Returns:
+        ComidResolver: Shared COMID resolver.
+    """
+    return _resolver
+
+
+def get_flowline_provider() -> FlowlineProvider:
+    """Get the process-wide flowline provider.
+
+    An NHDFlowlineIndex is used when the ``NLDI_XSTOOL_NHD_PATH`` environment
+    variable names a flowline file, otherwise the NLDI backed COMID resolver.
+
+    Returns:
+        FlowlineProvider: Shared flowline provider.
+    """
+    global _provider
+    if _provider is None:
+        path = os.environ.get("NLDI_XSTOOL_NHD_PATH")
+        _provider = NHDFlowlineIndex(path) if path else _resolver
+    return _provider
+
+
+def set_flowline_provider(provider: FlowlineProvider) -> None:
+    """Replace the process-wide flowline provider.
+
+    Args:
+        provider (FlowlineProvider): Flowline provider to use.
+    """
+    global _provider
+    _provider = provider
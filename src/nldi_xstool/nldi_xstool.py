@@ -1,21 +1,38 @@
 """Main module."""
 # from nldi_xstool.cli import xsatendpts
+import math
 import sys
+import warnings
+from functools import lru_cache
 from typing import Any
+from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Sequence
 from typing import Tuple
+from typing import Union
 
 import geopandas as gpd
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
-import py3dep
 import requests
-from pynhd import NLDI
+import shapely
 from shapely.geometry import LineString
-from shapely.geometry import Point
 
+from nldi_xstool.coverage import get_coverage_index
+from nldi_xstool.coverage import query_covers
+from nldi_xstool.elevation import ElevationSource
+from nldi_xstool.elevation import get_elevation_source
+from nldi_xstool.flowlines import get_flowline_provider
 from nldi_xstool.PathGen import PathGen
+from nldi_xstool.sampler import sample_dataframe
+from nldi_xstool.transform import DIST_CRS
+from nldi_xstool.transform import geodesic_distance
+from nldi_xstool.transform import OUT_CRS
+from nldi_xstool.transform import transform
+from nldi_xstool.transform import WORK_CRS
+from nldi_xstool.XSFan import XSFan
 from nldi_xstool.XSGen import XSGen
 
 
@@ -23,82 +40,126 @@ def dataframe_to_geodataframe(
     df: pd.DataFrame, crs: str
 ) -> gpd.GeoDataFrame:  # noqa D103
     """Convert pandas Dataframe to Geodataframe."""
-    geometry = [Point(xy) for xy in zip(df.x, df.y)]
+    geometry = gpd.points_from_xy(df.x, df.y)
     df = df.drop(["x", "y"], axis=1)
     gdf = gpd.GeoDataFrame(df, geometry=geometry, crs=crs)
     return gdf
 
 
+def best_resolution(bbox: Tuple[float, float, float, float], default: int = 10) -> int:
+    """Get the finest 3DEP resolution whose coverage covers bbox.
+
+    Resolutions covering only part of bbox are passed over for the next
+    coarser one. Answers are cached per bbox, snapped outward to 0.001 degree
+    so nearby requests share entries, and per coverage index, so replacing it
+    invalidates them; failed lookups are not cached.
+
+    Parameters
+    ----------
+    bbox : Tuple[float, float, float, float]
+        (minx, miny, maxx, maxy) in geographic coordinates
+    default : int, optional
+        Resolution returned when no DEM covers bbox or the lookup fails, by
+        default 10
+
+    Returns
+    -------
+    int
+        Resolution in meters
+    """
+    snapped = (
+        math.floor(bbox[0] * 1000.0) / 1000.0,
+        math.floor(bbox[1] * 1000.0) / 1000.0,
+        math.ceil(bbox[2] * 1000.0) / 1000.0,
+        math.ceil(bbox[3] * 1000.0) / 1000.0,
+    )
+    index = get_coverage_index()
+    version = None if index is None else (id(index), index.built)
+    try:
+        return _best_resolution(snapped, version) or default
+    except requests.RequestException:
+        return default
+
+
+@lru_cache(maxsize=4096)
+def _best_resolution(
+    bbox: Tuple[float, float, float, float], version: Optional[Tuple[int, float]]
+) -> Optional[int]:
+    """Finest resolution, in meters, of the res_types covering bbox.
+
+    version identifies the coverage index the answer comes from and is only
+    part of the cache key.
+    """
+    found = [int(k[4:-1]) for k, v in query_covers(bbox).items() if v]
+    return min(found) if found else None
+
+
+def _resolve_res(
+    res: Optional[Union[int, str]], bounds: Tuple[float, float, float, float]
+) -> Any:
+    """Resolve res "auto" to the finest DEM available in bounds, in WORK_CRS."""
+    if res != "auto":
+        return res
+    corners = np.array(bounds)[[0, 1, 2, 1, 2, 3, 0, 3]].reshape(4, 2)
+    lon, lat = transform(corners[:, 0], corners[:, 1], WORK_CRS, OUT_CRS)
+    return best_resolution((lon.min(), lat.min(), lon.max(), lat.max()))
+
+
 def getxsatendpts(
     path: List[Tuple[float, float]],
-    numpts: int,
+    numpts: Union[int, str],
     crs: str = "epsg:4326",
     file: Optional[str] = None,
-    res: Optional[int] = 10,
+    res: Optional[Union[int, str]] = 10,
+    source: Optional[ElevationSource] = None,
+    geodesic: bool = False,
 ) -> Any:
-    """Get cross-section at user defined endpoints.
+    """Get cross-section along a user defined path.
+
+    The path may have any number of vertices. Points are spaced evenly along
+    its total length, elevations are sampled from a single DEM covering the
+    whole path, and the distance of each point is its station along the path.
 
     Parameters
     ----------
     path : List[Tuple[float, float]]
-        [description]
-    numpts : int
-        [description]
+        Vertices of the path in crs, two or more
+    numpts : Union[int, str]
+        Number of points, or "auto" for one per DEM pixel along the path
     crs : str, optional
         [description], by default "epsg:4326"
     file : str, optional
         [description], by default ""
-    res : int, optional
-        [description], by default 10
+    res : Union[int, str], optional
+        Resolution of DEM in meters, or "auto" for the finest available along
+        the path, by default 10
+    source : ElevationSource, optional
+        Source of elevation data, by default the process-wide source (3DEP)
+    geodesic : bool, optional
+        Measure distance on the ellipsoid rather than in EPSG:5071, by default
+        False
 
     Returns
     -------
     Any
         [description]
     """
-    lnst = []
-    for pt in path:
-        # print(pt[0], pt[1])
-        # x.append(pt[0])
-        # y.append(pt[1])
-        lnst.append(Point(pt[0], pt[1]))
-    # ls1 = LineString(lnst)
-    # print(ls1)
-    d = {"name": ["xspath"], "geometry": [LineString(lnst)]}
-    gpd_pth = gpd.GeoDataFrame(d, crs=crs)
-    # print(gpd_pth)
-    # gpd_pth.set_crs(epsg=4326, inplace=True)
-    gpd_pth.to_crs(epsg=3857, inplace=True)
-    # print(gpd_pth)
-    xs = PathGen(path_geom=gpd_pth, ny=numpts)
-    xs_line = xs.get_xs()
-    # print(xs_line.head())
-    # print(xs_line.total_bounds, xs_line.bounds)
-    bb = xs_line.total_bounds - ((100.0, 100.0, -100.0, -100.0))
-    # print('before dem', bb)
-    dem = py3dep.get_map(
-        "DEM", tuple(bb), resolution=res, geo_crs="EPSG:3857", crs="epsg:3857"
-    )
-
-    # print('after dem')
+    xy = np.asarray(path, dtype=np.double).reshape(-1, 2)
+    px, py = transform(xy[:, 0], xy[:, 1], crs, WORK_CRS)
+    path_line = LineString(np.column_stack([px, py]))
+    res = _resolve_res(res, path_line.bounds)
+    if numpts == "auto":
+        numpts = max(2, math.ceil(path_line.length / res) + 1)
+    xs = PathGen(path_geom=path_line, ny=int(numpts))
     x, y = xs.get_xs_points()
-    dsi = dem.interp(x=("z", x), y=("z", y))
-    # dsi2 = dsi.to_crs("epsg:5071")
-    # x1 = dsi.coords["x"].values - dsi.coords["x"].values[0]
-    # y1 = dsi.coords["y"].values - dsi.coords["y"].values[0]
-    # dist = np.hypot(x1, y1)
-    pdsi = dsi.to_dataframe()
-    # pdsi["distance"] = dist
-
-    # gpdsi = gpd.GeoDataFrame(pdsi, gpd.points_from_xy(pdsi.x.values, pdsi.y.values))
-    gpdsi = dataframe_to_geodataframe(pdsi, crs="epsg:3857")
-    # gpdsi.to_crs('epsg:5071', inplace=True)
-    # x1 = gpdsi['geometry'].x.values[0] - gpdsi['geometry'].x.values[:]
-    # y1 = gpdsi['geometry'].y.values[0] - gpdsi['geometry'].y.values[:]
-    # dist = np.hypot(x1, y1)
-    gpdsi["distance"] = _get_dist(gpdsi)
-    # gpdsi.set_crs(epsg=3857, inplace=True)
-    gpdsi.to_crs(epsg=4326, inplace=True)
+    # get topo along a corridor around the xs line, not its whole bounding box
+    if source is None:
+        source = get_elevation_source()
+    dem = source.get_corridor([shapely.linestrings(x, y)], res, WORK_CRS)
+    pdsi = sample_dataframe(dem, x, y)
+    lon, lat = transform(x, y, WORK_CRS, OUT_CRS)
+    distance = _get_path_dist(xs.get_xs_distance(), px, py, geodesic)
+    gpdsi = _xs_geodataframe(pdsi, lon, lat, distance)
     if file:
         with open(file, "w") as f:
             f.write(gpdsi.to_json())
@@ -109,19 +170,85 @@ def getxsatendpts(
         return gpdsi
 
 
-def _get_dist(gdf: gpd.GeoDataFrame):
-    data = gdf.to_crs(epsg=5071)
-    x1 = data["geometry"].x.values[0] - data["geometry"].x.values[:]
-    y1 = data["geometry"].y.values[0] - data["geometry"].y.values[:]
-    return np.hypot(x1, y1)
+def _xs_geodataframe(
+    pdsi: pd.DataFrame,
+    lon: npt.NDArray[np.double],
+    lat: npt.NDArray[np.double],
+    distance: npt.NDArray[np.double],
+) -> gpd.GeoDataFrame:
+    """Convert sampled points to the output GeoDataFrame at lon, lat."""
+    gdf = gpd.GeoDataFrame(
+        pdsi.drop(columns=["x", "y"]),
+        geometry=gpd.points_from_xy(lon, lat),
+        crs=OUT_CRS,
+    )
+    gdf["distance"] = distance
+    return gdf
+
+
+def _get_path_dist(
+    station: npt.NDArray[np.double],
+    px: npt.NDArray[np.double],
+    py: npt.NDArray[np.double],
+    geodesic: bool = False,
+) -> npt.NDArray[np.double]:
+    """Station, in DIST_CRS or geodesic, of stations in WORK_CRS along the path.
+
+    Only the path vertices are reprojected; stations are mapped between the
+    cumulative vertex lengths.
+    """
+    work = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(px), np.diff(py)))))
+    if geodesic:
+        lon, lat = transform(px, py, WORK_CRS, OUT_CRS)
+        seg = geodesic_distance(lon[:-1], lat[:-1], lon[1:], lat[1:])
+    else:
+        dx, dy = transform(px, py, WORK_CRS, DIST_CRS)
+        seg = np.hypot(np.diff(dx), np.diff(dy))
+    return np.interp(station, work, np.concatenate(([0.0], np.cumsum(seg))))
+
+
+def _get_dist(
+    x: npt.NDArray[np.double],
+    y: npt.NDArray[np.double],
+    lon: npt.NDArray[np.double],
+    lat: npt.NDArray[np.double],
+    station: npt.NDArray[np.double],
+    xs_ids: Optional[npt.NDArray[np.int_]] = None,
+    geodesic: bool = False,
+) -> npt.NDArray[np.double]:
+    """Distance of points from the first point of their straight cross-section.
+
+    Stations in WORK_CRS are scaled to DIST_CRS by the ratio of each
+    cross-section's length in both, so only its end points are reprojected.
+    With geodesic, distances are measured on the ellipsoid from lon, lat.
+    Points of a cross-section must be contiguous, xs_ids sorted.
+    """
+    x, y, lon, lat, station = (np.ravel(v) for v in (x, y, lon, lat, station))
+    if xs_ids is None:
+        xs_ids = np.zeros(x.size, dtype=int)
+    first = np.flatnonzero(np.r_[True, xs_ids[1:] != xs_ids[:-1]])
+    counts = np.diff(np.r_[first, x.size])
+    if geodesic:
+        start = np.repeat(first, counts)
+        return geodesic_distance(lon[start], lat[start], lon, lat)
+    last = first + counts - 1
+    ends = np.r_[first, last]
+    dx, dy = transform(x[ends], y[ends], WORK_CRS, DIST_CRS)
+    n = first.size
+    work = np.hypot(x[last] - x[first], y[last] - y[first])
+    dist = np.hypot(dx[n:] - dx[:n], dy[n:] - dy[:n])
+    ratio = np.divide(dist, work, out=np.ones(n), where=work > 0.0)
+    return station * np.repeat(ratio, counts)
 
 
 def getxsatpoint(
     point: List[float],
-    numpoints: int,
+    numpoints: Union[int, str],
     width: float,
     file: Optional[str] = None,
-    res: Optional[int] = 10,
+    res: Optional[Union[int, str]] = 10,
+    source: Optional[ElevationSource] = None,
+    geodesic: bool = False,
 ) -> Any:
     """Get cross-section at user defined point.
 
@@ -129,57 +256,54 @@ def getxsatpoint(
     ----------
     point : List[float]
         [description]
-    numpoints : int
-        [description]
+    numpoints : Union[int, str]
+        Number of points, or "auto" for one per DEM pixel across width
     width : float
-        [description]
+        Width of the cross-section, in meters in EPSG:5070
     file : str, optional
         [description], by default ""
-    res : int, optional
-        [description], by default 10
+    res : Union[int, str], optional
+        Resolution of DEM in meters, or "auto" for the finest available around
+        the point, by default 10
+    source : ElevationSource, optional
+        Source of elevation data, by default the process-wide source (3DEP)
+    geodesic : bool, optional
+        Measure distance on the ellipsoid rather than in EPSG:5071, by default
+        False
 
     Returns
     -------
     [type]
         [description]
     """
-    # print(file, type(file))
-    # tpoint = f'POINT({point[1]} {point[0]})'
-    df = pd.DataFrame(
-        {"pointofinterest": ["this"], "Lat": [point[1]], "Lon": [point[0]]}
-    )
-    gpd_pt = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.Lon, df.Lat))
-    gpd_pt.set_crs(epsg=4326, inplace=True)
-    gpd_pt.to_crs(epsg=3857, inplace=True)
+    px, py = transform(point[0], point[1], OUT_CRS, WORK_CRS)
+    half = width / 2.0
+    res = _resolve_res(res, (px - half, py - half, px + half, py + half))
+    if numpoints == "auto":
+        numpoints = math.ceil(width / res) + 1
     try:
-        comid = __get_cid_from_lonlat(point)
+        comid, strm_seg = get_flowline_provider().lookup(point[0], point[1])
     except Exception as ex:  # pragma: no cover
         # print(f'Error: {ex} unable to find comid - check lon lat coords')
         sys.exit(f"Error: {ex} unable to find comid - check lon lat coords")
     # print(f'comid = {comid}')
-    strm_seg = NLDI().getfeature_byid("comid", comid).to_crs("epsg:3857")
-    xs = XSGen(point=gpd_pt, cl_geom=strm_seg, ny=numpoints, width=width, tension=10.0)
-    xs_line = xs.get_xs()
-    # print(comid, xs_line)
-    # get topo polygon with buffer to ensure there is enough topography to interpolate xs line
-    # With coarsest DEM (30m) 100. m should
-    bb = xs_line.total_bounds - ((100.0, 100.0, -100.0, -100.0))
-    dem = py3dep.get_map(
-        "DEM", tuple(bb), resolution=res, geo_crs="EPSG:3857", crs="epsg:3857"
+    xs = XSGen(
+        point=(float(px), float(py)),
+        cl_geom=strm_seg,
+        ny=int(numpoints),
+        width=width,
+        tension=10.0,
+        window=width,
     )
     x, y = xs.get_xs_points()
-    dsi = dem.interp(x=("z", x), y=("z", y))
-    # x1 = dsi.coords["x"].values - dsi.coords["x"].values[0]
-    # y1 = dsi.coords["y"].values - dsi.coords["y"].values[0]
-    # dist = np.hypot(x1, y1)
-    pdsi = dsi.to_dataframe()
-    # pdsi["distance"] = dist
-
-    # gpdsi = gpd.GeoDataFrame(pdsi, gpd.points_from_xy(pdsi.x.values, pdsi.y.values))
-    gpdsi = dataframe_to_geodataframe(pdsi, crs="epsg:3857")
-    gpdsi["distance"] = _get_dist(gpdsi)
-    # gpdsi.set_crs(epsg=3857, inplace=True)
-    gpdsi.to_crs(epsg=4326, inplace=True)
+    # get topo along a corridor around the xs line, not its whole bounding box
+    if source is None:
+        source = get_elevation_source()
+    dem = source.get_corridor([shapely.linestrings(x, y)], res, WORK_CRS)
+    pdsi = sample_dataframe(dem, x, y)
+    lon, lat = transform(x, y, WORK_CRS, OUT_CRS)
+    distance = _get_dist(x, y, lon, lat, xs.get_xs_distance(), geodesic=geodesic)
+    gpdsi = _xs_geodataframe(pdsi, lon, lat, distance)
     if file:
         with open(str(file), "w") as f:
             f.write(gpdsi.to_json())
@@ -190,34 +314,244 @@ def getxsatpoint(
         return gpdsi  # pragma: no cover
 
 
-def __lonlat_to_point(lon: float, lat: float) -> Point:  # noqa D103
-    return Point(lon, lat)
+def _lookup_comids(provider: Any, pts: npt.NDArray[np.double]) -> npt.NDArray[Any]:
+    """Get the COMID of each (lon, lat) point, None where none is found."""
+    if hasattr(provider, "lookup_many"):
+        return provider.lookup_many(pts[:, 0], pts[:, 1])
+    comids = np.full(len(pts), None, dtype=object)
+    for i, (lon, lat) in enumerate(pts):
+        try:
+            comids[i] = provider.lookup(lon, lat)[0]
+        except Exception:  # pragma: no cover
+            comids[i] = None
+    return comids
+
+
+def _cluster_footprints(bounds: npt.NDArray[np.double], size: float) -> List[List[int]]:
+    """Group footprints (minx, miny, maxx, maxy) into clusters no wider than size.
+
+    Footprints are taken greedily; each joins a cluster seeded in its own or a
+    neighbouring grid cell when the cluster's extent stays within size.
+    """
+    clusters: List[List[int]] = []
+    extents: List[npt.NDArray[np.double]] = []
+    cells: Dict[Tuple[int, int], List[int]] = {}
+    centers = (bounds[:, :2] + bounds[:, 2:]) / 2.0
+    keys = np.floor(centers / size).astype(int)
+    for i in np.lexsort((keys[:, 1], keys[:, 0])):
+        kx, ky = keys[i]
+        near = [
+            c
+            for cx in (kx - 1, kx, kx + 1)
+            for cy in (ky - 1, ky, ky + 1)
+            for c in cells.get((cx, cy), [])
+        ]
+        for c in near:
+            ext = np.concatenate(
+                (
+                    np.minimum(extents[c][:2], bounds[i, :2]),
+                    np.maximum(extents[c][2:], bounds[i, 2:]),
+                )
+            )
+            if max(ext[2] - ext[0], ext[3] - ext[1]) <= size:
+                clusters[c].append(int(i))
+                extents[c] = ext
+                break
+        else:
+            cells.setdefault((kx, ky), []).append(len(clusters))
+            clusters.append([int(i)])
+            extents.append(bounds[i].copy())
+    return clusters
+
+
+def getxsatpoints(
+    points: Sequence[Tuple[float, float]],
+    numpoints: Union[int, Sequence[int]],
+    width: Union[float, Sequence[float]],
+    file: Optional[str] = None,
+    res: Optional[int] = 10,
+    source: Optional[ElevationSource] = None,
+    cluster_size: Optional[float] = None,
+    geodesic: bool = False,
+) -> Any:
+    """Get cross-sections at many user defined points.
 
+    Cross-section footprints are grouped into square clusters; one DEM is
+    fetched per cluster and every cross-section in the cluster is sampled from
+    it in a single interpolation.
 
-def __get_cid_from_lonlat(point: List[float]) -> str:
-    # print(point)
-    pt = __lonlat_to_point(point[0], point[1])
-    location = pt.wkt
-    location = f"POINT({point[0]} {point[1]})"
-    base_url = "https://labs.waterdata.usgs.gov/api/nldi/linked-data/comid/position?f=json&coords="
-    url = base_url + location
-    # print(url)
+    Parameters
+    ----------
+    points : Sequence[Tuple[float, float]]
+        (lon, lat) of each point of interest
+    numpoints : Union[int, Sequence[int]]
+        Number of points in each cross-section, one value or one per point
+    width : Union[float, Sequence[float]]
+        Width of each cross-section, in meters in EPSG:5070, one value or one
+        per point
+    file : str, optional
+        Path of GeoJSON output, by default None returns a GeoDataFrame
+    res : int, optional
+        Resolution of DEM in meters, by default 10
+    source : ElevationSource, optional
+        Source of elevation data, by default the process-wide source (3DEP)
+    cluster_size : float, optional
+        Side, in EPSG:5070 meters, of the clusters cross-sections are grouped in,
+        by default 500 DEM pixels
+    geodesic : bool, optional
+        Measure distance on the ellipsoid rather than in EPSG:5071, by default
+        False
+
+    Returns
+    -------
+    Any
+        GeoDataFrame of cross-section points with an xs_id column giving the
+        index of the point of interest, or 0 when written to file
+
+    Raises
+    ------
+    LookupError
+        No point resolved to a COMID; points that do not are skipped with a
+        warning
+    """
+    pts = np.asarray(points, dtype=np.double).reshape(-1, 2)
+    npts = len(pts)
+    nums = np.broadcast_to(np.asarray(numpoints, dtype=int), npts)
+    widths = np.broadcast_to(np.asarray(width, dtype=np.double), npts)
+    if cluster_size is None:
+        cluster_size = 500.0 * (res or 10)
+    if source is None:
+        source = get_elevation_source()
+
+    gx, gy = transform(pts[:, 0], pts[:, 1], OUT_CRS, WORK_CRS)
+    provider = get_flowline_provider()
+    comids = _lookup_comids(provider, pts)
+
+    sections: Dict[int, XSGen] = {}
+    for i in range(npts):
+        if comids[i] is None:
+            warnings.warn(
+                f"unable to find comid for point {i} - check lon lat coords",
+                stacklevel=2,
+            )
+            continue
+        sections[i] = XSGen(
+            point=(gx[i], gy[i]),
+            cl_geom=provider.flowline(comids[i]),
+            ny=int(nums[i]),
+            width=float(widths[i]),
+            tension=10.0,
+            window=float(widths[i]),
+        )
+    if not sections:
+        raise LookupError("unable to find comid for any point - check lon lat coords")
+    ids = np.array(list(sections), dtype=int)
+    # cluster nearby xs, then get topo along a corridor around each cluster
+    bounds = np.array(
+        [
+            (x.min(), y.min(), x.max(), y.max())
+            for x, y in (sections[i].get_xs_points() for i in ids)
+        ],
+        dtype=np.double,
+    ).reshape(-1, 4) + (-100.0, -100.0, 100.0, 100.0)
+
+    frames = []
+    for members in _cluster_footprints(bounds, cluster_size):
+        xs_ids = np.concatenate([np.full(sections[ids[m]].ny, ids[m]) for m in members])
+        x = np.concatenate([sections[ids[m]].get_xs_points()[0] for m in members])
+        y = np.concatenate([sections[ids[m]].get_xs_points()[1] for m in members])
+        lines = [
+            shapely.linestrings(*sections[ids[m]].get_xs_points()) for m in members
+        ]
+        dem = source.get_corridor(lines, res, WORK_CRS)
+        pdsi = sample_dataframe(dem, x, y)
+        pdsi["xs_id"] = xs_ids
+        pdsi["station"] = np.concatenate(
+            [sections[ids[m]].get_xs_distance() for m in members]
+        )
+        frames.append(pdsi)
+
+    pdsi = pd.concat(frames, ignore_index=True)
+    pdsi.sort_values("xs_id", kind="stable", inplace=True, ignore_index=True)
+    x = pdsi["x"].to_numpy()
+    y = pdsi["y"].to_numpy()
+    lon, lat = transform(x, y, WORK_CRS, OUT_CRS)
+    station = pdsi.pop("station").to_numpy()
+    distance = _get_dist(x, y, lon, lat, station, pdsi["xs_id"].to_numpy(), geodesic)
+    gpdsi = _xs_geodataframe(pdsi, lon, lat, distance)
+    if file:
+        with open(str(file), "w") as f:
+            f.write(gpdsi.to_json())
+        return 0
+    else:
+        return gpdsi
+
+
+def getxsalongreach(
+    point: List[float],
+    spacing: float,
+    numpoints: int,
+    width: float,
+    file: Optional[str] = None,
+    res: Optional[int] = 10,
+    source: Optional[ElevationSource] = None,
+    geodesic: bool = False,
+) -> Any:
+    """Get cross-sections every spacing along the reach nearest a point.
+
+    The reach's tension spline is fit once and all cross-sections are sampled
+    from one DEM in a single interpolation.
+
+    Parameters
+    ----------
+    point : List[float]
+        (lon, lat) of a point on the reach
+    spacing : float
+        Distance, in EPSG:5070 meters, between cross-sections along the reach
+    numpoints : int
+        Number of points in each cross-section
+    width : float
+        Width of each cross-section, in meters in EPSG:5070
+    file : str, optional
+        Path of GeoJSON output, by default None returns a GeoDataFrame
+    res : int, optional
+        Resolution of DEM in meters, by default 10
+    source : ElevationSource, optional
+        Source of elevation data, by default the process-wide source (3DEP)
+    geodesic : bool, optional
+        Measure distance on the ellipsoid rather than in EPSG:5071, by default
+        False
+
+    Returns
+    -------
+    Any
+        GeoDataFrame of cross-section points with xs_id and station columns,
+        or 0 when written to file
+    """
     try:
-        response = requests.get(url)
-        # print(f'this is the response: {response}')
-        response.raise_for_status()
-        jres = response.json()
-        comid = jres["features"][0]["properties"]["comid"]
-
-    except requests.exceptions.RequestException as err:  # pragma: no cover
-        print("OOps: Something Else", err)
-    except requests.exceptions.HTTPError as errh:  # pragma: no cover
-        print("Http Error:", errh)
-    except requests.exceptions.ConnectionError as errc:  # pragma: no cover
-        print("Error Connecting:", errc)
-    except requests.exceptions.Timeout as errt:  # pragma: no cover
-        print("Timeout Error:", errt)
+        _comid, strm_seg = get_flowline_provider().lookup(point[0], point[1])
     except Exception as ex:  # pragma: no cover
-        raise ex
-
-    return str(comid)
+        sys.exit(f"Error: {ex} unable to find comid - check lon lat coords")
+    fan = XSFan(cl_geom=strm_seg, spacing=spacing, ny=numpoints, width=width)
+    x, y = fan.get_xs_points()
+    # get topo along a corridor around the fan, not its whole bounding box
+    if source is None:
+        source = get_elevation_source()
+    dem = source.get_corridor(
+        shapely.linestrings(np.stack([x, y], axis=-1)), res, WORK_CRS
+    )
+    pdsi = sample_dataframe(dem, x, y)
+    xs_ids = np.repeat(np.arange(x.shape[0]), x.shape[1])
+    pdsi["xs_id"] = xs_ids
+    pdsi["station"] = np.repeat(fan.stations, x.shape[1])
+    lon, lat = transform(x, y, WORK_CRS, OUT_CRS)
+    distance = _get_dist(x, y, lon, lat, fan.get_xs_distance(), xs_ids, geodesic)
+    gpdsi = _xs_geodataframe(
+        pdsi.reset_index(drop=True), lon.ravel(), lat.ravel(), distance
+    )
+    if file:
+        with open(str(file), "w") as f:
+            f.write(gpdsi.to_json())
+        return 0
+    else:
+        return gpdsi
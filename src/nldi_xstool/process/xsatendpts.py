@@ -35,7 +35,6 @@ PROCESS_METADATA = {
                 }
             },
             "minOccurs": 2,
-            "maxOccurs": 2,
         },
         {
             "id": "lon",
@@ -47,11 +46,11 @@ PROCESS_METADATA = {
                 }
             },
             "minOccurs": 2,
-            "maxOccurs": 2,
         },
         {
             "id": "numpts",
             "title": "numpts",
+            "abstract": "Number of points, or auto for one per DEM pixel",
             "input": {
                 "literalDataDomain": {
                     "dataType": "int",
@@ -64,7 +63,7 @@ PROCESS_METADATA = {
         {
             "id": "3dep_res",
             "title": "resolution",
-            "abstract": "Resolution of 3dep elevation data",
+            "abstract": "Resolution of 3dep elevation data, auto for the finest available",
             "minOccurs": 1,
             "maxOccurs": 1,
             "input": {
@@ -73,7 +72,7 @@ PROCESS_METADATA = {
                     "valueDefinition": {
                         "anyValue": False,
                         "defaultValue": "10",
-                        "possibleValues": ["30", "10", "5", "3", "1"],
+                        "possibleValues": ["30", "10", "5", "3", "1", "auto"],
                     },
                 }
             },
@@ -115,8 +114,10 @@ class NLDIxsatendptsProcessor(BaseProcessor):  # type: ignore
         mimetype = "application/json"
         lat = list(data["lat"])
         lon = list(data["lon"])
-        numpts = int(data["numpts"])
-        res = int(data["3dep_res"])
+        numpts = data["numpts"]
+        numpts = numpts if numpts == "auto" else int(numpts)
+        res = data["3dep_res"]
+        res = res if res == "auto" else int(res)
 
         print(lat, lon, numpts, res)
 
@@ -124,7 +125,7 @@ class NLDIxsatendptsProcessor(BaseProcessor):  # type: ignore
 
         print("before function")
         results = getxsatendpts(
-            path=[(lon[0], lat[0]), (lon[1], lat[1])],
+            path=list(zip(lon, lat)),
             numpts=numpts,
             res=res,
             crs="epsg:4326",
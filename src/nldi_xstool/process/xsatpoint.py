@@ -51,6 +51,7 @@ PROCESS_METADATA = {
         {
             "id": "width",
             "title": "width",
+            "abstract": "Width of the cross-section in meters (EPSG:5070)",
             "input": {
                 "literalDataDomain": {
                     "dataType": "float",
@@ -63,6 +64,7 @@ PROCESS_METADATA = {
         {
             "id": "numpts",
             "title": "numpts",
+            "abstract": "Number of points, or auto for one per DEM pixel",
             "input": {
                 "literalDataDomain": {
                     "dataType": "int",
@@ -72,6 +74,23 @@ PROCESS_METADATA = {
             "minOccurs": 1,
             "maxOccurs": 1,
         },
+        {
+            "id": "3dep_res",
+            "title": "resolution",
+            "abstract": "Resolution of 3dep elevation data, auto for the finest available",
+            "minOccurs": 0,
+            "maxOccurs": 1,
+            "input": {
+                "literalDataDomain": {
+                    "dataType": "enum",
+                    "valueDefinition": {
+                        "anyValue": False,
+                        "defaultValue": "10",
+                        "possibleValues": ["30", "10", "5", "3", "1", "auto"],
+                    },
+                }
+            },
+        },
     ],
     "outputs": [
         {
@@ -107,15 +126,18 @@ class NLDIxsatpointProcessor(BaseProcessor):  # type: ignore
         mimetype = "application/json"
         lat = float(data["lat"])
         lon = float(data["lon"])
-        numpts = int(data["numpts"])
+        numpts = data["numpts"]
+        numpts = numpts if numpts == "auto" else int(numpts)
         width = float(data["width"])
+        res = data.get("3dep_res", "10")
+        res = res if res == "auto" else int(res)
 
         # print(lat, lon, width, numpts)
 
         timebefore = time.perf_counter()
 
         # print("before function")
-        results = getxsatpoint([lon, lat], numpts, width)
+        results = getxsatpoint([lon, lat], numpts, width, res=res)
         # print("after function")
         # print(results)
 
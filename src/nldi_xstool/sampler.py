@@ -0,0 +1,321 @@
+"""Sample DEM elevations at points.
+
+Elevations are read straight from the DEM's numpy buffer using the affine
+transform of its regular grid, without copying the raster. Any number of
+points, for example every point of thousands of cross-sections, can be
+sampled in one call.
+"""
+import math
+from functools import partial
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import xarray as xr
+
+METHODS = ("linear", "nearest", "cubic")
+
+
+def grid_transform(dem: xr.DataArray) -> Tuple[float, float, float, float]:
+    """Get the affine transform of the DEM's grid of pixel centers.
+
+    Args:
+        dem (xr.DataArray): DEM with regular x and y coordinates.
+
+    Raises:
+        ValueError: The grid is not regular.
+
+    Returns:
+        Tuple[float, float, float, float]: x0, dx, y0, dy such that pixel
+            (row, col) is centered at (x0 + col * dx, y0 + row * dy).
+    """
+    x = dem.x.values
+    y = dem.y.values
+    if x.size < 2 or y.size < 2:
+        raise ValueError("DEM must have at least 2 pixels along x and y")
+    dx = (x[-1] - x[0]) / (x.size - 1)
+    dy = (y[-1] - y[0]) / (y.size - 1)
+    tol = 1e-6 * max(abs(dx), abs(dy))
+    if np.any(np.abs(np.diff(x) - dx) > tol) or np.any(np.abs(np.diff(y) - dy) > tol):
+        raise ValueError("DEM grid is not regular")
+    return float(x[0]), float(dx), float(y[0]), float(dy)
+
+
+def _gather(
+    values: npt.NDArray[np.double],
+    row: npt.NDArray[np.intp],
+    col: npt.NDArray[np.intp],
+    nodata: Optional[float],
+) -> npt.NDArray[np.double]:
+    """Get pixel values, with nodata as NaN."""
+    v = values[row, col].astype(np.double)
+    if nodata is not None:
+        v[v == nodata] = np.nan
+    return v
+
+
+def _cubic_weights(t: npt.NDArray[np.double]) -> npt.NDArray[np.double]:
+    """Keys cubic convolution weights (a = -0.5) of the 4 pixels around t."""
+    t2 = t * t
+    t3 = t2 * t
+    return np.stack(
+        [
+            -0.5 * t3 + t2 - 0.5 * t,
+            1.5 * t3 - 2.5 * t2 + 1.0,
+            -1.5 * t3 + 2.0 * t2 + 0.5 * t,
+            0.5 * t3 - 0.5 * t2,
+        ]
+    )
+
+
+def _interpolate(
+    gather: Callable[
+        [npt.NDArray[np.intp], npt.NDArray[np.intp]], npt.NDArray[np.double]
+    ],
+    shape: Tuple[int, int],
+    fr: npt.NDArray[np.double],
+    fc: npt.NDArray[np.double],
+    method: str,
+) -> npt.NDArray[np.double]:
+    """Interpolate at fractional pixel indices of a raster read with gather."""
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got {method}")
+    nrow, ncol = shape
+    inside = (fc >= 0.0) & (fc <= ncol - 1) & (fr >= 0.0) & (fr <= nrow - 1)
+    fc = np.where(inside, fc, 0.0)
+    fr = np.where(inside, fr, 0.0)
+
+    if method == "nearest":
+        z = gather(np.rint(fr).astype(np.intp), np.rint(fc).astype(np.intp))
+    else:
+        c0 = np.minimum(np.floor(fc).astype(np.intp), ncol - 2)
+        r0 = np.minimum(np.floor(fr).astype(np.intp), nrow - 2)
+        tc = fc - c0
+        tr = fr - r0
+        if method == "linear":
+            z = (1.0 - tr) * (
+                (1.0 - tc) * gather(r0, c0) + tc * gather(r0, c0 + 1)
+            ) + tr * ((1.0 - tc) * gather(r0 + 1, c0) + tc * gather(r0 + 1, c0 + 1))
+        else:
+            wc = _cubic_weights(tc)
+            wr = _cubic_weights(tr)
+            z = np.zeros(fc.shape, dtype=np.double)
+            for i in range(4):
+                row = np.clip(r0 + i - 1, 0, nrow - 1)
+                for j in range(4):
+                    col = np.clip(c0 + j - 1, 0, ncol - 1)
+                    z += wr[i] * wc[j] * gather(row, col)
+    return np.where(inside, z, np.nan)
+
+
+def sample(
+    values: npt.NDArray[np.double],
+    transform: Tuple[float, float, float, float],
+    x: npt.ArrayLike,
+    y: npt.ArrayLike,
+    method: str = "linear",
+    nodata: Optional[float] = None,
+) -> npt.NDArray[np.double]:
+    """Sample a raster at points.
+
+    Args:
+        values (npt.NDArray[np.double]): Raster, rows along y.
+        transform (Tuple[float, float, float, float]): x0, dx, y0, dy of the
+            grid of pixel centers, as returned by grid_transform.
+        x (npt.ArrayLike): x of points, any shape.
+        y (npt.ArrayLike): y of points, same shape as x.
+        method (str): "linear" (bilinear), "nearest" or "cubic" (bicubic).
+            Defaults to "linear".
+        nodata (Optional[float]): Pixel value to treat as missing, in addition
+            to NaN. Defaults to None.
+
+    Returns:
+        npt.NDArray[np.double]: Elevations, NaN outside the raster or where
+            a contributing pixel is missing.
+    """
+    x0, dx, y0, dy = transform
+    fc = (np.asarray(x, dtype=np.double) - x0) / dx
+    fr = (np.asarray(y, dtype=np.double) - y0) / dy
+    gather = partial(_gather, values, nodata=nodata)
+    return _interpolate(gather, values.shape, fr, fc, method)
+
+
+class DEMMosaic:
+    """DEMMosaic class.
+
+    Lazy mosaic of DEM tiles cut from one grid of square cells, such as the
+    tiles of a corridor along a cross-section. The tiles are never merged
+    into one raster: each pixel an interpolation needs is read from the tile
+    holding it, so samples are seamless across tile edges.
+    """
+
+    def __init__(self: "DEMMosaic", tiles: Sequence[xr.DataArray], step: float) -> None:
+        """Init DEMMosaic.
+
+        Args:
+            tiles (Sequence[xr.DataArray]): DEM tiles with the same resolution,
+                each covering one cell of the grid.
+            step (float): Size of the grid cells.
+
+        Raises:
+            ValueError: No tiles, or tiles not on one pixel grid.
+        """
+        if not tiles:
+            raise ValueError("DEMMosaic needs at least one tile")
+        self.step = step
+        self.tiles: Dict[
+            Tuple[int, int],
+            Tuple[npt.NDArray[np.double], Tuple[float, float, float, float]],
+        ] = {}
+        left, top = np.inf, -np.inf
+        right, bottom = -np.inf, np.inf
+        ref = grid_transform(tiles[0])
+        for tile in tiles:
+            transform = grid_transform(tile)
+            x0, dx, y0, dy = transform
+            # pixels are looked up by rounding, so every tile must share a grid
+            offset = np.array([x0 - ref[0], y0 - ref[2]]) / abs(ref[1])
+            if not np.allclose([dx, dy], [ref[1], ref[3]]) or not np.allclose(
+                offset, np.rint(offset), atol=1e-6
+            ):
+                raise ValueError("DEMMosaic tiles are not on one pixel grid")
+            xs = (x0, x0 + dx * (tile.sizes["x"] - 1))
+            ys = (y0, y0 + dy * (tile.sizes["y"] - 1))
+            # tiles may carry a margin around their cell, key them by center
+            key = (math.floor(sum(xs) / 2.0 / step), math.floor(sum(ys) / 2.0 / step))
+            self.tiles[key] = (np.asarray(tile.transpose("y", "x").data), transform)
+            left, right = min(left, *xs), max(right, *xs)
+            bottom, top = min(bottom, *ys), max(top, *ys)
+        self.res = abs(dx)
+        self.transform = (left, self.res, top, -self.res)
+        self.shape = (
+            int(round((top - bottom) / self.res)) + 1,
+            int(round((right - left) / self.res)) + 1,
+        )
+        self.name = tiles[0].name
+        self.coords = {k: v for k, v in tiles[0].coords.items() if v.ndim == 0}
+
+    def _gather(
+        self: "DEMMosaic",
+        row: npt.NDArray[np.intp],
+        col: npt.NDArray[np.intp],
+        nodata: Optional[float],
+    ) -> npt.NDArray[np.double]:
+        """Get pixel values of the mosaic grid from the tiles holding them."""
+        x0, dx, y0, dy = self.transform
+        x = (x0 + col * dx).ravel()
+        y = (y0 + row * dy).ravel()
+        ti = np.floor(x / self.step).astype(np.int64)
+        tj = np.floor(y / self.step).astype(np.int64)
+        keys, inverse = np.unique(np.stack([ti, tj]), axis=1, return_inverse=True)
+        inverse = inverse.ravel()
+        out = np.full(x.size, np.nan)
+        for k, (i, j) in enumerate(keys.T):
+            tile = self.tiles.get((int(i), int(j)))
+            if tile is None:
+                continue
+            values, (tx0, tdx, ty0, tdy) = tile
+            m = np.flatnonzero(inverse == k)
+            c = np.rint((x[m] - tx0) / tdx).astype(np.intp)
+            r = np.rint((y[m] - ty0) / tdy).astype(np.intp)
+            ok = (c >= 0) & (c < values.shape[1]) & (r >= 0) & (r < values.shape[0])
+            out[m[ok]] = values[r[ok], c[ok]]
+        if nodata is not None:
+            out[out == nodata] = np.nan
+        return out.reshape(row.shape)
+
+    def sample(
+        self: "DEMMosaic",
+        x: npt.ArrayLike,
+        y: npt.ArrayLike,
+        method: str = "linear",
+        nodata: Optional[float] = None,
+    ) -> npt.NDArray[np.double]:
+        """Sample the mosaic at points.
+
+        Args:
+            x (npt.ArrayLike): x of points, any shape.
+            y (npt.ArrayLike): y of points, same shape as x.
+            method (str): "linear", "nearest" or "cubic". Defaults to "linear".
+            nodata (Optional[float]): Pixel value to treat as missing, in
+                addition to NaN. Defaults to None.
+
+        Returns:
+            npt.NDArray[np.double]: Elevations, NaN outside the tiles.
+        """
+        x0, dx, y0, dy = self.transform
+        fc = (np.asarray(x, dtype=np.double) - x0) / dx
+        fr = (np.asarray(y, dtype=np.double) - y0) / dy
+        gather = partial(self._gather, nodata=nodata)
+        return _interpolate(gather, self.shape, fr, fc, method)
+
+
+def sample_dem(
+    dem: Union[xr.DataArray, DEMMosaic],
+    x: npt.ArrayLike,
+    y: npt.ArrayLike,
+    method: str = "linear",
+    nodata: Optional[float] = None,
+) -> npt.NDArray[np.double]:
+    """Sample a DEM at points.
+
+    Args:
+        dem (Union[xr.DataArray, DEMMosaic]): DEM with regular x and y
+            coordinates, or mosaic of DEM tiles.
+        x (npt.ArrayLike): x of points, any shape.
+        y (npt.ArrayLike): y of points, same shape as x.
+        method (str): "linear", "nearest" or "cubic". Defaults to "linear".
+        nodata (Optional[float]): Pixel value to treat as missing, in addition
+            to NaN. Defaults to None.
+
+    Returns:
+        npt.NDArray[np.double]: Elevations at the points.
+    """
+    if isinstance(dem, DEMMosaic):
+        return dem.sample(x, y, method=method, nodata=nodata)
+    values = np.asarray(dem.transpose("y", "x").data)
+    return sample(values, grid_transform(dem), x, y, method=method, nodata=nodata)
+
+
+def sample_dataframe(
+    dem: Union[xr.DataArray, DEMMosaic],
+    x: npt.ArrayLike,
+    y: npt.ArrayLike,
+    method: str = "linear",
+    nodata: Optional[float] = None,
+) -> pd.DataFrame:
+    """Sample a DEM at points into a DataFrame.
+
+    The DataFrame has the columns ``dem.interp(...).to_dataframe()`` would
+    give: the DEM's scalar coordinates, x, y and the elevations named after
+    the DEM.
+
+    Args:
+        dem (Union[xr.DataArray, DEMMosaic]): DEM with regular x and y
+            coordinates, or mosaic of DEM tiles.
+        x (npt.ArrayLike): x of points.
+        y (npt.ArrayLike): y of points.
+        method (str): "linear", "nearest" or "cubic". Defaults to "linear".
+        nodata (Optional[float]): Pixel value to treat as missing, in addition
+            to NaN. Defaults to None.
+
+    Returns:
+        pd.DataFrame: One row per point.
+    """
+    x = np.asarray(x, dtype=np.double).ravel()
+    y = np.asarray(y, dtype=np.double).ravel()
+    columns = {
+        name: np.full(x.size, coord.values)
+        for name, coord in dem.coords.items()
+        if coord.ndim == 0
+    }
+    columns["x"] = x
+    columns["y"] = y
+    columns[dem.name or "elevation"] = sample_dem(dem, x, y, method, nodata)
+    return pd.DataFrame(columns, index=pd.RangeIndex(x.size, name="z"))
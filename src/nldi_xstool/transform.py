@@ -0,0 +1,89 @@
+"""Coordinate transformation between the CRSs used by nldi_xstool.
+
+Cross-sections are built in WORK_CRS, distances along them are measured in
+DIST_CRS or on the ellipsoid, and results are returned in geographic
+coordinates (OUT_CRS).
+WORK_CRS is CONUS Albers equal-area, in meters, and DEMs are requested in it
+directly. This avoids the 1/cos(lat) pixel inflation of Web Mercator and the
+server-side reprojection to it.
+Building a pyproj Transformer is far more expensive than using one, so
+transformers are created once per thread and CRS pair and reused; pyproj
+transformers must not be shared between threads.
+"""
+import threading
+from typing import Dict
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+from pyproj import Geod
+from pyproj import Transformer
+
+WORK_CRS = "epsg:5070"
+DIST_CRS = "epsg:5071"
+OUT_CRS = "epsg:4326"
+
+_local = threading.local()
+_geod = Geod(ellps="GRS80")
+
+
+def get_transformer(src: str, dst: str) -> Transformer:
+    """Get the cached transformer from src to dst for the calling thread.
+
+    Args:
+        src (str): Source CRS.
+        dst (str): Destination CRS.
+
+    Returns:
+        Transformer: Transformer with x, y (lon, lat) axis order.
+    """
+    cache: Dict[Tuple[str, str], Transformer] = getattr(_local, "transformers", None)
+    if cache is None:
+        cache = _local.transformers = {}
+    key = (str(src).lower(), str(dst).lower())
+    transformer = cache.get(key)
+    if transformer is None:
+        transformer = cache[key] = Transformer.from_crs(key[0], key[1], always_xy=True)
+    return transformer
+
+
+def transform(
+    x: npt.ArrayLike, y: npt.ArrayLike, src: str, dst: str
+) -> Tuple[npt.NDArray[np.double], npt.NDArray[np.double]]:
+    """Transform coordinates from src to dst.
+
+    Args:
+        x (npt.ArrayLike): x (or longitude) of points.
+        y (npt.ArrayLike): y (or latitude) of points.
+        src (str): Source CRS.
+        dst (str): Destination CRS.
+
+    Returns:
+        Tuple[npt.NDArray[np.double], npt.NDArray[np.double]]: Transformed x
+            and y.
+    """
+    x = np.asarray(x, dtype=np.double)
+    y = np.asarray(y, dtype=np.double)
+    if str(src).lower() == str(dst).lower():
+        return x, y
+    return get_transformer(src, dst).transform(x, y)
+
+
+def geodesic_distance(
+    lon1: npt.ArrayLike, lat1: npt.ArrayLike, lon2: npt.ArrayLike, lat2: npt.ArrayLike
+) -> npt.NDArray[np.double]:
+    """Get geodesic distances, on the GRS80 ellipsoid, between points.
+
+    Args:
+        lon1 (npt.ArrayLike): Longitude of first points.
+        lat1 (npt.ArrayLike): Latitude of first points.
+        lon2 (npt.ArrayLike): Longitude of second points.
+        lat2 (npt.ArrayLike): Latitude of second points.
+
+    Returns:
+        npt.NDArray[np.double]: Distances in meters.
+    """
+    lon1, lat1, lon2, lat2 = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.double) for v in (lon1, lat1, lon2, lat2))
+    )
+    return np.asarray(_geod.inv(lon1, lat1, lon2, lat2)[2])
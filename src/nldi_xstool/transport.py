@@ -0,0 +1,211 @@
+"""Shared HTTP transport for upstream services (NLDI, NCAT, 3DEP index).
+
+All requests go through one ``requests.Session`` whose connection pools are
+kept alive per host, with connect and read timeouts and retries with
+jittered exponential backoff on connection errors and transient statuses.
+Batches of requests are issued concurrently over the same pools.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+
+Params = Optional[Mapping[str, Any]]
+
+
+class Transport:
+    """Transport class.
+
+    Pooled, retrying HTTP client shared by every module. The underlying
+    session is safe to use from several threads.
+    """
+
+    def __init__(
+        self: "Transport",
+        timeout: Tuple[float, float] = (5.0, 60.0),
+        retries: int = 3,
+        backoff: float = 0.5,
+        pool_size: int = 16,
+        max_workers: int = 8,
+    ) -> None:
+        """Init Transport.
+
+        Args:
+            timeout (Tuple[float, float]): Connect and read timeouts in seconds.
+                Defaults to (5.0, 60.0).
+            retries (int): Number of retries after the first attempt. Defaults
+                to 3.
+            backoff (float): Base delay in seconds; retry n waits about
+                backoff * 2**n, jittered by +-50%. Defaults to 0.5.
+            pool_size (int): Connections kept alive per host. Defaults to 16.
+            max_workers (int): Concurrent requests of a batch. Defaults to 8.
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _delay(
+        self: "Transport", attempt: int, response: Optional[requests.Response]
+    ) -> float:
+        delay = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+        retry_after = ""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return float(delay)
+
+    def get(self: "Transport", url: str, params: Params = None) -> requests.Response:
+        """GET url, retrying connection errors and transient statuses.
+
+        Args:
+            url (str): URL.
+            params (Params): Query parameters. Defaults to None.
+
+        Raises:
+            RequestException: The last attempt failed.
+
+        Returns:
+            requests.Response: Successful response.
+        """
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            response = None
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or last:
+                    response.raise_for_status()
+                    return response
+            time.sleep(self._delay(attempt, response))
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def get_json(self: "Transport", url: str, params: Params = None) -> Any:
+        """GET url and decode its JSON body.
+
+        Args:
+            url (str): URL.
+            params (Params): Query parameters. Defaults to None.
+
+        Returns:
+            Any: Decoded JSON.
+        """
+        return self.get(url, params).json()
+
+    def get_json_many(
+        self: "Transport", queries: Sequence[Tuple[str, Params]]
+    ) -> List[Any]:
+        """GET many URLs concurrently and decode their JSON bodies.
+
+        Args:
+            queries (Sequence[Tuple[str, Params]]): (url, params) of each
+                request.
+
+        Returns:
+            List[Any]: Decoded JSON, or the exception raised, of each request
+                in order.
+        """
+
+        def fetch(req: Tuple[str, Params]) -> Any:
+            try:
+                return self.get_json(*req)
+            except Exception as ex:
+                return ex
+
+        if len(queries) < 2:
+            return [fetch(req) for req in queries]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(fetch, queries))
+
+    async def aget_json(self: "Transport", url: str, params: Params = None) -> Any:
+        """Awaitable get_json, run in a worker thread over the shared pools.
+
+        Args:
+            url (str): URL.
+            params (Params): Query parameters. Defaults to None.
+
+        Returns:
+            Any: Decoded JSON.
+        """
+        return await asyncio.to_thread(self.get_json, url, params)
+
+    async def aget_json_many(
+        self: "Transport", queries: Sequence[Tuple[str, Params]]
+    ) -> List[Any]:
+        """Awaitable get_json_many.
+
+        Args:
+            queries (Sequence[Tuple[str, Params]]): (url, params) of each
+                request.
+
+        Returns:
+            List[Any]: Decoded JSON, or the exception raised, of each request
+                in order.
+        """
+        return await asyncio.to_thread(self.get_json_many, queries)
+
+    def close(self: "Transport") -> None:
+        """Close pooled connections."""
+        self.session.close()
+
+
+_transport: Optional[Transport] = None
+_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """Get the process-wide transport.
+
+    Connect and read timeouts, in seconds, are taken from the
+    ``NLDI_XSTOOL_HTTP_TIMEOUT`` environment variable, one value for both or
+    ``connect,read``, and the number of retries from ``NLDI_XSTOOL_HTTP_RETRIES``.
+
+    Returns:
+        Transport: Shared transport.
+    """
+    global _transport
+    with _lock:
+        if _transport is None:
+            kwargs: Dict[str, Any] = {}
+            timeout = os.environ.get("NLDI_XSTOOL_HTTP_TIMEOUT")
+            if timeout:
+                values = [float(v) for v in timeout.split(",")]
+                kwargs["timeout"] = (values[0], values[-1])
+            retries = os.environ.get("NLDI_XSTOOL_HTTP_RETRIES")
+            if retries:
+                kwargs["retries"] = int(retries)
+            _transport = Transport(**kwargs)
+        return _transport
+
+
+def set_transport(transport: Transport) -> None:
+    """Replace the process-wide transport.
+
+    Args:
+        transport (Transport): Transport to use.
+    """
+    global _transport
+    with _lock:
+        _transport = transport
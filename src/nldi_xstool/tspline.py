@@ -2,8 +2,19 @@
 
 Code based on Fortran code developed by Jonathan Nelson (jmn@usgs.gov) at USGS.
 """
+from typing import Optional
+from typing import Tuple
+
 import numpy as np
 import numpy.typing as npt
+from scipy.linalg import solve_banded
+
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None
+
+HAVE_NUMBA = numba is not None
 
 
 def tspline(
@@ -109,3 +120,233 @@ def tspline(
         yout[i] = (yp[nj] * sinhd1 + yp[nj - 1] * sinhd2) / sinhs + (
             (y[nj] - yp[nj]) * del1 + (y[nj - 1] - yp[nj - 1]) * del2
         ) / dels
+
+
+class TensionSpline:
+    """Tension spline solved with a banded solver and evaluated vectorized.
+
+    Reproduces the tspline routine above: the tridiagonal system the routine
+    sweeps with Python loops is assembled and solved with
+    scipy.linalg.solve_banded, and output points are located with
+    numpy.searchsorted and evaluated as whole arrays. Like the routine, the
+    solution depends on the last two entries of the yp and temp work arrays it
+    is given, which Centerline carries from the x to the y spline.
+    """
+
+    def __init__(
+        self: "TensionSpline",
+        x: npt.NDArray[np.double],
+        y: npt.NDArray[np.double],
+        sigma: float,
+        yp: Optional[npt.NDArray[np.double]] = None,
+        temp: Optional[npt.NDArray[np.double]] = None,
+        use_numba: bool = HAVE_NUMBA,
+    ) -> None:
+        """Init TensionSpline.
+
+        Args:
+            x (npt.NDArray[np.double]): Increasing abscissae, at least 3.
+            y (npt.NDArray[np.double]): Ordinates.
+            sigma (float): Tension.
+            yp (Optional[npt.NDArray[np.double]]): yp work array of a previous
+                solve, as passed to tspline. Defaults to zeros.
+            temp (Optional[npt.NDArray[np.double]]): temp work array of a
+                previous solve, as passed to tspline. Defaults to zeros.
+            use_numba (bool): Evaluate with the compiled numba kernel.
+                Defaults to True when numba is installed.
+
+        Raises:
+            ImportError: use_numba is True and numba is not installed.
+        """
+        if use_numba and _evaluate_numba is None:
+            raise ImportError("numba is required for use_numba=True")
+        self.use_numba = use_numba
+        self.x = np.asarray(x, dtype=np.double)
+        self.y = np.asarray(y, dtype=np.double)
+        n = self.x.size
+        yp_last, yp_prev = (0.0, 0.0) if yp is None else (yp[n - 1], yp[n - 2])
+        tmp_last, tmp_prev = (0.0, 0.0) if temp is None else (temp[n - 1], temp[n - 2])
+        x, y = self.x, self.y
+
+        deln = x[n - 1] - x[n - 2]
+        delnm1 = x[n - 2] - x[n - 3]
+        delnn = x[n - 1] - x[n - 3]
+        c1 = (delnn + deln) / delnn / deln
+        c2 = -delnn / deln / delnm1
+        c3 = deln / delnn / delnm1
+        slppn = c3 * y[n - 3] + c2 * y[n - 2] + c1 * y[n - 1]
+        self.sigmap = np.fabs(sigma) * (float(n - 2)) / (x[n - 1] - x[0])
+
+        # per-interval slopes and tridiagonal coefficients
+        delx = np.diff(x)
+        slope = np.diff(y) / delx
+        dels = self.sigmap * delx
+        exps = np.exp(dels)
+        sinhs = 0.5 * (exps - 1.0 / exps)
+        sinhin = 1.0 / (delx * sinhs)
+        diag = sinhin * (dels * (0.5 * (exps + 1.0 / exps)) - sinhs)
+        spdiag = sinhin * (sinhs - dels)
+
+        m = n - 2
+        yp_out = np.empty(n, dtype=np.double)
+        yp_out[n - 1] = (slppn - slope[m - 1] - spdiag[m - 1] * yp_prev) / (
+            diag[m - 1] - spdiag[m - 1] * tmp_prev
+        )
+        yp_out[n - 2] = yp_prev - tmp_prev * yp_out[n - 1]
+
+        ab = np.zeros((3, m), dtype=np.double)
+        ab[0, 1:] = spdiag[: m - 1]
+        ab[1, 0] = 2.0 * diag[0] - spdiag[0] * tmp_last
+        ab[1, 1:] = diag[: m - 1] + diag[1:m]
+        ab[2, :-1] = spdiag[: m - 1]
+        rhs = np.empty(m, dtype=np.double)
+        rhs[0] = -spdiag[0] * yp_last
+        rhs[1:] = slope[1:m] - slope[: m - 1]
+        rhs[m - 1] -= spdiag[m - 1] * yp_out[n - 2]
+        yp_out[:m] = solve_banded((1, 1), ab, rhs, check_finite=False)
+        self.yp = yp_out
+        self._delx = delx
+        self._sinhs = sinhs
+
+    def _locate(
+        self: "TensionSpline", xout: npt.NDArray[np.double]
+    ) -> Tuple[npt.NDArray[np.intp], npt.NDArray[np.double], npt.NDArray[np.double]]:
+        nj = np.clip(np.searchsorted(self.x, xout, side="left"), 1, self.x.size - 1)
+        return nj, xout - self.x[nj - 1], self.x[nj] - xout
+
+    def __call__(
+        self: "TensionSpline", xout: npt.NDArray[np.double]
+    ) -> npt.NDArray[np.double]:
+        """Evaluate the spline.
+
+        Args:
+            xout (npt.NDArray[np.double]): Abscissae to evaluate at.
+
+        Returns:
+            npt.NDArray[np.double]: Spline values at xout.
+        """
+        xout = np.asarray(xout, dtype=np.double)
+        if self.use_numba:
+            yout = np.empty(xout.size, dtype=np.double)
+            _evaluate_numba(self.x, self.y, self.yp, self.sigmap, xout.ravel(), yout)
+            return yout.reshape(xout.shape)
+        nj, del1, del2 = self._locate(xout)
+        dels = self._delx[nj - 1]
+        sinhs = self._sinhs[nj - 1]
+        exps = np.exp(self.sigmap * del1)
+        sinhd1 = 0.5 * (exps - 1.0 / exps)
+        exps = np.exp(self.sigmap * del2)
+        sinhd2 = 0.5 * (exps - 1.0 / exps)
+        yp, y = self.yp, self.y
+        return (yp[nj] * sinhd1 + yp[nj - 1] * sinhd2) / sinhs + (
+            (y[nj] - yp[nj]) * del1 + (y[nj - 1] - yp[nj - 1]) * del2
+        ) / dels
+
+    def derivative(
+        self: "TensionSpline", xout: npt.NDArray[np.double], order: int = 1
+    ) -> npt.NDArray[np.double]:
+        """Evaluate the first or second derivative of the spline.
+
+        Args:
+            xout (npt.NDArray[np.double]): Abscissae to evaluate at.
+            order (int): 1 or 2. Defaults to 1.
+
+        Returns:
+            npt.NDArray[np.double]: Derivative values at xout.
+        """
+        xout = np.asarray(xout, dtype=np.double)
+        nj, del1, del2 = self._locate(xout)
+        sig = self.sigmap
+        sinhs = self._sinhs[nj - 1]
+        yp, y = self.yp, self.y
+        if order == 2:
+            return (
+                sig
+                * sig
+                * (yp[nj] * np.sinh(sig * del1) + yp[nj - 1] * np.sinh(sig * del2))
+                / sinhs
+            )
+        dels = self.x[nj] - self.x[nj - 1]
+        return (
+            sig
+            * (yp[nj] * np.cosh(sig * del1) - yp[nj - 1] * np.cosh(sig * del2))
+            / sinhs
+            + ((y[nj] - yp[nj]) - (y[nj - 1] - yp[nj - 1])) / dels
+        )
+
+
+def _evaluate_loop(
+    x: npt.NDArray[np.double],
+    y: npt.NDArray[np.double],
+    yp: npt.NDArray[np.double],
+    sigmap: float,
+    xout: npt.NDArray[np.double],
+    yout: npt.NDArray[np.double],
+) -> None:  # pragma: no cover
+    """Evaluation loop of tspline, compiled with numba when available."""
+    a = x[0]
+    b = x[1]
+    nj = 1
+    for i in range(xout.size):
+        while xout[i] > b and nj < x.size - 1:
+            a = b
+            nj = nj + 1
+            b = x[nj]
+        del1 = xout[i] - a
+        del2 = b - xout[i]
+        dels = b - a
+        exps1 = np.exp(sigmap * del1)
+        sinhd1 = 0.5 * (exps1 - 1.0 / exps1)
+        exps = np.exp(sigmap * del2)
+        sinhd2 = 0.5 * (exps - 1.0 / exps)
+        exps = exps * exps1
+        sinhs = 0.5 * (exps - 1.0 / exps)
+        yout[i] = (yp[nj] * sinhd1 + yp[nj - 1] * sinhd2) / sinhs + (
+            (y[nj] - yp[nj]) * del1 + (y[nj - 1] - yp[nj - 1]) * del2
+        ) / dels
+
+
+_evaluate_numba = numba.njit(cache=True)(_evaluate_loop) if numba else None
+
+
+def tspline_fast(
+    x: npt.NDArray[np.double],
+    y: npt.NDArray[np.double],
+    n: int,
+    xout: npt.NDArray[np.double],
+    yout: npt.NDArray[np.double],
+    iout: int,
+    sigma: float,
+    yp: npt.NDArray[np.double],
+    temp: npt.NDArray[np.double],
+) -> None:
+    """Drop-in replacement of tspline built on TensionSpline.
+
+    Fills yout and yp as tspline does; temp is read but left unchanged, as no
+    caller uses the elimination factors tspline leaves in it. The numba kernel
+    is used for evaluation when numba is installed.
+
+    Parameters
+    ----------
+    x : npt.NDArray[np.double]
+        Increasing abscissae
+    y : npt.NDArray[np.double]
+        Ordinates
+    n : int
+        Number of points in x and y
+    xout : npt.NDArray[np.double]
+        Increasing abscissae to evaluate at
+    yout : npt.NDArray[np.double]
+        Output spline values
+    iout : int
+        Number of points in xout
+    sigma : float
+        Tension
+    yp : npt.NDArray[np.double]
+        yp work array
+    temp : npt.NDArray[np.double]
+        temp work array
+    """
+    spline = TensionSpline(x[:n], y[:n], sigma, yp=yp, temp=temp)
+    yp[:n] = spline.yp
+    yout[:iout] = spline(xout[:iout])
@@ -0,0 +1,52 @@
+"""Fixtures shared by the cross-section tests, without network access."""
+import geopandas as gpd
+import numpy as np
+import pytest
+import xarray as xr
+from shapely.geometry import LineString
+
+from nldi_xstool import flowlines
+from nldi_xstool.elevation import ElevationSource
+from nldi_xstool.flowlines import NHDFlowlineIndex
+
+
+class PlaneSource(ElevationSource):
+    """Planar DEM, z = 0.001 * (x + y), counting requests."""
+
+    def __init__(self):
+        """Init PlaneSource."""
+        self.calls = 0
+        self.res = None
+
+    def get_dem(self, bbox, res, crs):
+        """Get planar DEM covering bbox."""
+        self.calls += 1
+        self.res = res
+        x = np.arange(bbox[0], bbox[2] + res, res)
+        y = np.arange(bbox[3], bbox[1] - res, -res)
+        data = 0.001 * np.add.outer(y, x)
+        return xr.DataArray(
+            data, coords={"y": y, "x": x}, dims=("y", "x"), name="elevation"
+        )
+
+
+@pytest.fixture
+def nhd_index(tmp_path, monkeypatch):
+    """Two north-flowing reaches about 85 km apart."""
+    lines = [
+        LineString([(-103.80, 40.26), (-103.8002, 40.27), (-103.80, 40.28)]),
+        LineString([(-104.80, 40.26), (-104.8002, 40.27), (-104.80, 40.28)]),
+    ]
+    path = tmp_path / "nhd.gpkg"
+    gpd.GeoDataFrame({"comid": [1001, 1002]}, geometry=lines, crs="epsg:4326").to_file(
+        path, driver="GPKG"
+    )
+    index = NHDFlowlineIndex(path, max_distance=1000.0)
+    monkeypatch.setattr(flowlines, "_provider", index)
+    return index
+
+
+@pytest.fixture
+def plane_source():
+    """Planar elevation source counting its DEM requests."""
+    return PlaneSource()
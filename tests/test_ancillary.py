@@ -1,12 +1,21 @@
 """Test get_ext_bathy_xs."""
+import numpy as np
 import numpy.testing as npt
+import pandas as pd
 import pytest
 from shapely.geometry import LineString
 from shapely.geometry import Point
 
+from nldi_xstool import ancillary
+from nldi_xstool import coverage
+from nldi_xstool import transport
+from nldi_xstool.ancillary import GageDatumStore
 from nldi_xstool.ancillary import get_ext_bathy_xs
 from nldi_xstool.ancillary import get_gage_datum
+from nldi_xstool.ancillary import get_gage_datums
+from nldi_xstool.ancillary import query_dems_bulk
 from nldi_xstool.ancillary import query_dems_shape
+from nldi_xstool.ancillary import res_types
 
 
 @pytest.mark.parametrize(
@@ -72,3 +81,146 @@ def test_run_querydemoshap(path):
     bbox = LineString(linst).envelope.bounds
     result = query_dems_shape(bbox=bbox)
     print(result)
+
+
+class _IndexTransport(transport.Transport):
+    """3DEPElevationIndex with 1 m DEMs west of -100 only, failing on 5 m."""
+
+    def get_json(self, url, params=None):
+        layer = int(url.split("/")[-2])
+        if layer == res_types["res_5m"]:
+            raise transport.requests.HTTPError("500")
+        minx = float(params["geometry"].split('"')[1])
+        has_dem = layer != res_types["res_1m"] or minx < -100.0
+        return {"features": [{}] if has_dem else []}
+
+
+def test_query_dems_bulk(monkeypatch):
+    """Every bbox and resolution is queried, failures are missing values."""
+    monkeypatch.setattr(transport, "_transport", _IndexTransport())
+    monkeypatch.setattr(coverage, "_index", None)
+    monkeypatch.setattr(coverage, "_loaded", True)
+    bboxes = [(-105.0, 40.0, -104.9, 40.1), (-95.0, 40.0, -94.9, 40.1)]
+    avail = query_dems_bulk(bboxes)
+    assert list(avail.columns) == list(res_types)
+    assert list(avail["res_1m"]) == [True, False]
+    assert avail["res_10m"].all()
+    assert avail["res_5m"].isna().all()
+    with pytest.raises(transport.requests.HTTPError):
+        query_dems_shape(bboxes[0])
+
+
+class _NCATTransport(transport.Transport):
+    """NCAT adding 0.5 m to NGVD29 heights, counting requests."""
+
+    calls = 0
+
+    def get_json(self, url, params=None):
+        _NCATTransport.calls += 1
+        return {"destOrthoht": str(float(params["orthoHt"]) + 0.5)}
+
+
+def test_get_gage_datums(monkeypatch, tmp_path):
+    """Site records are fetched in one request, then read from the store."""
+    records = []
+
+    def get_record(sites, service):
+        records.append(list(sites))
+        return pd.DataFrame(
+            {
+                "site_no": ["01", "02", "03"],
+                "alt_datum_cd": ["NGVD29", "NAVD88", "NAVD88"],
+                "alt_va": [100.0, 200.0, float("nan")],
+                "coord_datum_cd": ["NAD83", "NAD83", "NAD83"],
+                "dec_lat_va": [40.0, 41.0, 42.0],
+                "dec_long_va": [-105.0, -104.0, -103.0],
+            }
+        ).query("site_no in @sites")
+
+    monkeypatch.setattr(ancillary.nwis, "get_record", get_record)
+    monkeypatch.setattr(transport, "_transport", _NCATTransport())
+    store = GageDatumStore(tmp_path / "datums.sqlite")
+    datums = get_gage_datums(["01", "02", "03"], store=store)
+    assert records == [["01", "02", "03"]]
+    npt.assert_allclose(datums["01"], 100.0 * 0.3048 + 0.5)
+    npt.assert_allclose(datums["02"], 200.0 * 0.3048)
+    assert np.isnan(datums["03"])
+    assert _NCATTransport.calls == 1
+
+    assert get_gage_datums(["02", "01"], store=store) == {
+        "02": datums["02"],
+        "01": datums["01"],
+    }
+    assert len(records) == 1 and _NCATTransport.calls == 1
+    assert GageDatumStore(tmp_path / "datums.sqlite", ttl=-1.0).get_many(["01"]) == {}
+
+    monkeypatch.setattr(ancillary, "_datum_store", store)
+    npt.assert_allclose(get_gage_datum("02"), datums["02"])
+    with pytest.raises(LookupError):
+        get_gage_datum("03")
+
+
+def test_get_gage_datums_chunks(monkeypatch, tmp_path):
+    """Site records are fetched in chunks, a failed chunk leaves NaN."""
+    records = []
+
+    def get_record(sites, service):
+        records.append(list(sites))
+        if "03" in sites:
+            raise ValueError("service unavailable")
+        return pd.DataFrame(
+            {"site_no": sites, "alt_datum_cd": "NAVD88", "alt_va": 10.0}
+        )
+
+    monkeypatch.setattr(ancillary.nwis, "get_record", get_record)
+    store = GageDatumStore(tmp_path / "datums.sqlite")
+    with pytest.warns(UserWarning, match="03..04"):
+        datums = get_gage_datums(["01", "02", "03", "04", "05"], store=store, chunk=2)
+    assert records == [["01", "02"], ["03", "04"], ["05"]]
+    assert [np.isnan(datums[k]) for k in sorted(datums)] == [
+        False,
+        False,
+        True,
+        True,
+        False,
+    ]
+    npt.assert_allclose(datums["05"], 3.048)
+
+
+def test_gage_datum_store_site_key(tmp_path):
+    """A gage moved to a new datum replaces its row, rows expire by default."""
+    store = GageDatumStore(tmp_path / "datums.sqlite")
+    assert store.ttl is not None
+    store.put_many([("01", "NGVD29", 30.0)])
+    store.put_many([("01", "NAVD88", 31.0)])
+    assert store.get_many(["01"]) == {"01": 31.0}
+
+
+class _FailingNCATTransport(transport.Transport):
+    """NCAT answering every request with an error."""
+
+    def get_json(self, url, params=None):
+        return {"error": "service unavailable"}
+
+
+def test_get_gage_datums_ncat_failure(monkeypatch, tmp_path):
+    """A failed NGVD29 conversion is NaN with a warning naming the gage."""
+
+    def get_record(sites, service):
+        return pd.DataFrame(
+            {
+                "site_no": ["01"],
+                "alt_datum_cd": ["NGVD29"],
+                "alt_va": [100.0],
+                "coord_datum_cd": ["NAD83"],
+                "dec_lat_va": [40.0],
+                "dec_long_va": [-105.0],
+            }
+        )
+
+    monkeypatch.setattr(ancillary.nwis, "get_record", get_record)
+    monkeypatch.setattr(transport, "_transport", _FailingNCATTransport())
+    store = GageDatumStore(tmp_path / "datums.sqlite")
+    with pytest.warns(UserWarning, match="gage 01"):
+        datums = get_gage_datums(["01"], store=store)
+    assert np.isnan(datums["01"])
@@ -0,0 +1,52 @@
+"""Test the on-disk DEM cache."""
+import numpy as np
+import xarray as xr
+
+from nldi_xstool.cache import DEMCache
+
+
+def _fake_dem(bbox, res, crs):
+    x = np.arange(bbox[0] + res / 2.0, bbox[2], res)
+    y = np.arange(bbox[3] - res / 2.0, bbox[1], -res)
+    data = np.add.outer(y, x)
+    return xr.DataArray(
+        data, coords={"y": y, "x": x}, dims=("y", "x"), name="elevation"
+    )
+
+
+class _Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, bbox, res, crs):
+        self.calls += 1
+        return _fake_dem(bbox, res, crs)
+
+
+def test_dem_cache_hit(tmp_path):
+    """Nearby requests on the same snapped tile are served from disk."""
+    fetcher = _Counter()
+    cache = DEMCache(path=tmp_path, tile_pixels=16, fetcher=fetcher)
+    dem1 = cache.fetch((101.0, 102.0, 140.0, 150.0), 10, "epsg:3857")
+    dem2 = cache.fetch((105.0, 110.0, 150.0, 155.0), 10, "epsg:3857")
+    assert fetcher.calls == 1
+    assert cache.hits == 1 and cache.misses == 1
+    xr.testing.assert_allclose(dem1, dem2)
+    assert dem1.x.min() < 101.0 and dem1.x.max() > 140.0
+
+    cache.fetch((101.0, 102.0, 140.0, 150.0), 30, "epsg:3857")
+    assert fetcher.calls == 2
+
+
+def test_dem_cache_evict(tmp_path):
+    """The cache is trimmed to max_bytes, least recently used first."""
+    fetcher = _Counter()
+    cache = DEMCache(path=tmp_path, tile_pixels=16, fetcher=fetcher)
+    for i in range(4):
+        cache.fetch((i * 1000.0, 0.0, i * 1000.0 + 10.0, 10.0), 1, "epsg:3857")
+    one = cache.size() // 4
+    cache.max_bytes = 2 * one
+    cache.evict()
+    assert cache.size() <= 2 * one
+    assert cache.get((3000.0, 0.0, 3010.0, 10.0), 1, "epsg:3857") is not None
+    assert cache.get((0.0, 0.0, 10.0, 10.0), 1, "epsg:3857") is None
@@ -0,0 +1,62 @@
+"""Test the Centerline spline, headings and radii."""
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import LineString
+
+from nldi_xstool.centerline import Centerline
+
+
+def test_centerline_straight(capsys):
+    """A two-point segment is splined as a straight line, without output."""
+    gdf = gpd.GeoDataFrame(geometry=[LineString([(0.0, 0.0), (30.0, 40.0)])])
+    cl = Centerline(gdf, 11, 10.0)
+    x, y = cl.getinterppts()
+    np.testing.assert_allclose(cl.sout, np.linspace(0.0, 50.0, 11))
+    np.testing.assert_allclose(x, np.linspace(0.0, 30.0, 11), atol=1e-9)
+    np.testing.assert_allclose(y, np.linspace(0.0, 40.0, 11), atol=1e-9)
+    np.testing.assert_allclose(cl.phi_interp, np.arctan2(4.0, 3.0))
+    assert np.all(cl.r_interp[1:] == 100000000.0)
+    assert capsys.readouterr().out == ""
+
+
+def test_centerline_arc():
+    """Headings follow a quarter circle and radii stay finite."""
+    theta = np.linspace(-np.pi / 2.0, 0.0, 25)
+    line = LineString(np.column_stack([100.0 * np.cos(theta), 100.0 * np.sin(theta)]))
+    cl = Centerline(gpd.GeoDataFrame(geometry=[line]), 101, 10.0)
+    assert abs(cl.stot - line.length) < 1e-9
+    np.testing.assert_allclose(
+        cl.phi_interp[1:-1], np.linspace(0.0, np.pi / 2.0, 101)[1:-1], atol=0.05
+    )
+    assert np.all(np.isfinite(cl.r_interp))
+
+
+def test_centerline_project():
+    """Points are projected onto the foot of their perpendicular to the spline."""
+    t = np.linspace(0.0, 2.0 * np.pi, 40)
+    line = LineString(np.column_stack([500.0 * t, 200.0 * np.sin(t)]))
+    cl = Centerline(gpd.GeoDataFrame(geometry=[line]), 21, 10.0)
+    s = np.array([150.0, 1100.0, 2500.0])
+    x, y, phi = cl.evaluate(s)
+    px = x - 40.0 * np.sin(phi)
+    py = y + 40.0 * np.cos(phi)
+    np.testing.assert_allclose(cl.project(px, py), s, atol=1e-6)
+    assert cl.project(-100.0, 0.0) == 0.0
+
+
+def test_centerline_project_window():
+    """A factored-only spline projects points within a window of them."""
+    t = np.linspace(0.0, 40.0 * np.pi, 2000)
+    line = LineString(np.column_stack([500.0 * t, 200.0 * np.sin(t)]))
+    gdf = gpd.GeoDataFrame(geometry=[line])
+    cl = Centerline(gdf, 20001, 10.0)
+    local = Centerline(gdf, 20001, 10.0, sample=False)
+    assert local.xo_interp.size == 0
+    px = np.array([[1000.0, 30000.0], [45000.0, 60000.0]])
+    py = np.full(px.shape, 50.0)
+    np.testing.assert_allclose(
+        local.project(px, py, window=100.0), cl.project(px, py), atol=1e-6
+    )
+    with pytest.raises(ValueError):
+        local.project(px, py)
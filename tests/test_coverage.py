@@ -0,0 +1,108 @@
+"""Test the local 3DEP coverage index without network access."""
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+from nldi_xstool import ancillary
+from nldi_xstool import coverage
+from nldi_xstool import transport
+from nldi_xstool.ancillary import query_dems_bulk
+from nldi_xstool.ancillary import query_dems_shape
+from nldi_xstool.ancillary import refresh_coverage_index
+from nldi_xstool.ancillary import res_types
+from nldi_xstool.coverage import CoverageIndex
+
+# 1 m west of -100, 10 m everywhere in the box, nothing else
+POLYGONS = {
+    "res_1m": [box(-106.0, 39.0, -100.0, 41.0)],
+    "res_10m": [box(-106.0, 39.0, -94.0, 41.0), box(-80.0, 30.0, -79.0, 31.0)],
+}
+SITES = [(-105.0, 40.0, -104.9, 40.1), (-95.0, 40.0, -94.9, 40.1), (0.0, 0.0, 1, 1)]
+
+
+@pytest.fixture(autouse=True)
+def local_cache(tmp_path, monkeypatch):
+    """Keep the coverage index in a temporary cache directory."""
+    monkeypatch.setenv("NLDI_XSTOOL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(coverage, "_index", None)
+    monkeypatch.setattr(coverage, "_loaded", False)
+
+
+class _IndexTransport(transport.Transport):
+    """3DEPElevationIndex serving POLYGONS, one polygon per object id."""
+
+    def get_json(self, url, params=None):
+        layer = int(url.split("/")[-2])
+        res_type = {v: k for k, v in res_types.items()}[layer]
+        polys = POLYGONS.get(res_type, [])
+        if params.get("returnIdsOnly"):
+            return {"objectIds": list(range(len(polys)))}
+        ids = [int(v) for v in params["objectIds"].split(",")]
+        return gpd.GeoSeries([polys[i] for i in ids]).__geo_interface__
+
+
+def test_coverage_index(tmp_path):
+    """Imported polygons answer availability queries in-process."""
+    path = tmp_path / "polys.gpkg"
+    gpd.GeoDataFrame(
+        {"res": [k for k, v in POLYGONS.items() for _ in v]},
+        geometry=[p for v in POLYGONS.values() for p in v],
+        crs="epsg:4326",
+    ).to_file(path, driver="GPKG")
+    refresh_coverage_index(str(path), res_col="res")
+    assert coverage.coverage_path().exists()
+
+    expected = {k: k in ("res_1m", "res_10m") for k in res_types}
+    assert query_dems_shape(SITES[0]) == expected
+    assert ancillary.get_dem(SITES[1], "res_1m") is False
+    avail = query_dems_bulk(SITES)
+    assert list(avail["res_1m"]) == [True, False, False]
+    assert list(avail["res_10m"]) == [True, True, False]
+    assert not avail["res_3m"].any()
+
+    # a new process reads the index written to the cache
+    coverage._loaded = False
+    index = coverage.get_coverage_index()
+    assert index.query(SITES[0], ["res_1m"]) == {"res_1m": True}
+
+
+def test_coverage_download(monkeypatch):
+    """Coverage is downloaded once per layer in chunks of object ids."""
+    monkeypatch.setattr(transport, "_transport", _IndexTransport())
+    index = CoverageIndex.download(res_types, chunk=1)
+    assert index.coverage["res_type"].value_counts().to_dict() == {
+        "res_10m": 2,
+        "res_1m": 1,
+    }
+    assert index.query_many(SITES, ["res_10m"])["res_10m"].tolist() == [
+        True,
+        True,
+        False,
+    ]
+
+
+def test_coverage_built(monkeypatch):
+    """The build time is kept in the file, an index past its age is ignored."""
+    index = CoverageIndex(
+        gpd.GeoDataFrame({"res_type": ["res_1m"]}, geometry=[box(0, 0, 1, 1)]),
+        built=1000.0,
+    )
+    index.write(coverage.coverage_path())
+    assert coverage.get_coverage_index().built == 1000.0
+
+    monkeypatch.setenv("NLDI_XSTOOL_COVERAGE_MAX_AGE", "86400")
+    coverage._loaded = False
+    with pytest.warns(UserWarning, match="older than"):
+        assert coverage.get_coverage_index() is None
+
+    monkeypatch.setenv("NLDI_XSTOOL_COVERAGE_MAX_AGE", "1 day")
+    coverage._loaded = False
+    with pytest.warns(UserWarning, match="invalid NLDI_XSTOOL_COVERAGE_MAX_AGE"):
+        assert coverage.get_coverage_index().built == 1000.0
+
+
+def test_coverage_corrupt():
+    """An unreadable index falls back to the REST service with a warning."""
+    coverage.coverage_path().write_bytes(b"SQLite format 3\x00 truncated")
+    with pytest.warns(UserWarning, match="unable to read"):
+        assert coverage.get_coverage_index() is None
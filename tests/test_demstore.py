@@ -0,0 +1,42 @@
+"""Test the in-memory DEM store."""
+import numpy as np
+import xarray as xr
+
+from nldi_xstool.demstore import DEMStore
+
+
+def _fake_dem(bbox, res):
+    x = np.arange(bbox[0] + res / 2.0, bbox[2], res)
+    y = np.arange(bbox[3] - res / 2.0, bbox[1], -res)
+    data = np.add.outer(y, x)
+    return xr.DataArray(
+        data, coords={"y": y, "x": x}, dims=("y", "x"), name="elevation"
+    )
+
+
+def test_dem_store_window():
+    """A covered bbox is answered by a window of the stored raster."""
+    store = DEMStore()
+    store.add(_fake_dem((0.0, 0.0, 1000.0, 1000.0), 10), 10, "EPSG:3857")
+    dem = store.get((200.0, 300.0, 400.0, 500.0), 10, "epsg:3857")
+    assert dem is not None
+    assert dem.x.min() < 200.0 and dem.x.max() > 400.0
+    assert dem.y.min() < 300.0 and dem.y.max() > 500.0
+    assert dem.sizes["x"] < 30 and dem.sizes["y"] < 30
+    assert store.get((200.0, 300.0, 400.0, 500.0), 1, "epsg:3857") is None
+    assert store.get((900.0, 900.0, 1100.0, 1100.0), 10, "epsg:3857") is None
+    assert store.hits == 1 and store.misses == 2
+
+
+def test_dem_store_evict():
+    """Rasters with the fewest hits per byte are evicted first."""
+    small = _fake_dem((0.0, 0.0, 100.0, 100.0), 10)
+    store = DEMStore(max_bytes=3 * small.nbytes)
+    for i in range(3):
+        store.add(_fake_dem((i * 1000.0, 0.0, i * 1000.0 + 100.0, 100.0), 10), 10, "a")
+    assert store.get((10.0, 10.0, 50.0, 50.0), 10, "a") is not None
+    store.add(_fake_dem((5000.0, 0.0, 5100.0, 100.0), 10), 10, "a")
+    assert len(store.entries) == 3
+    assert store.size() <= store.max_bytes
+    assert store.get((10.0, 10.0, 50.0, 50.0), 10, "a") is not None
+    assert store.get((1010.0, 10.0, 1050.0, 50.0), 10, "a") is None
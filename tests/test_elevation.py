@@ -0,0 +1,98 @@
+"""Test elevation sources."""
+import numpy as np
+import numpy.testing as npt
+import pytest
+import rasterio
+import xarray as xr
+from rasterio.transform import from_origin
+from shapely.geometry import LineString
+
+from nldi_xstool.cache import DEMCache
+from nldi_xstool.cache import FETCH_MARGIN
+from nldi_xstool.demstore import DEMStore
+from nldi_xstool.elevation import ElevationSource
+from nldi_xstool.elevation import LocalRasterSource
+from nldi_xstool.elevation import ThreeDEPSource
+from nldi_xstool.sampler import sample_dem
+
+
+@pytest.fixture
+def dem_file(tmp_path):
+    """Write a 10 m planar DEM, z = x + 2y, in EPSG:5070."""
+    path = tmp_path / "dem.tif"
+    transform = from_origin(-700000.0, 1900000.0, 10.0, 10.0)
+    cols, rows = np.meshgrid(np.arange(200), np.arange(150))
+    x = -700000.0 + (cols + 0.5) * 10.0
+    y = 1900000.0 - (rows + 0.5) * 10.0
+    data = (x - -700000.0) + 2.0 * (y - 1898500.0)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=150,
+        width=200,
+        count=1,
+        dtype="float64",
+        crs="EPSG:5070",
+        transform=transform,
+        nodata=-9999.0,
+    ) as dst:
+        dst.write(data, 1)
+    return path
+
+
+def test_local_raster_source(dem_file):
+    """Only the window around the bbox is read, with native coordinates."""
+    source = LocalRasterSource([dem_file])
+    bbox = (-699500.0, 1899000.0, -699300.0, 1899200.0)
+    dem = source.get_dem(bbox, 10, "epsg:5070")
+    assert dem.sizes["x"] <= 23 and dem.sizes["y"] <= 23
+    assert dem.x.min() < bbox[0] and dem.x.max() > bbox[2]
+    assert dem.y.min() < bbox[1] and dem.y.max() > bbox[3]
+    z = dem.interp(x=-699400.0, y=1899100.0).values
+    npt.assert_allclose(z, 600.0 + 2.0 * 600.0)
+
+    with pytest.raises(LookupError):
+        source.get_dem((-699500.0, 1899000.0, -690000.0, 1899200.0), 10, "epsg:5070")
+
+
+def _plane_tile(bbox, res, crs):
+    x = np.arange(bbox[0] + res / 2.0, bbox[2], res)
+    y = np.arange(bbox[3] - res / 2.0, bbox[1], -res)
+    return xr.DataArray(
+        0.5 * x + 0.25 * y[:, None], coords={"y": y, "x": x}, dims=("y", "x")
+    ).rename("elevation")
+
+
+def test_corridor(tmp_path):
+    """A diagonal line is sampled from the tiles along it, seamlessly."""
+    bboxes = []
+
+    def fetcher(bbox, res, crs):
+        bboxes.append(bbox)
+        return _plane_tile(bbox, res, crs)
+
+    cache = DEMCache(path=tmp_path, fetcher=fetcher)
+    source = ThreeDEPSource(store=DEMStore(), cache=cache)
+    line = LineString([(3.0, 7.0), (1997.0, 1993.0)])
+    dem = source.get_corridor([line], 1, "epsg:5070")
+    # 40 m tiles, twice the request margin, independent of the cache tiles
+    assert all(b[2] - b[0] == 40.0 and b[3] - b[1] == 40.0 for b in bboxes)
+    # pixels requested, margins included, against the bbox of the line
+    pixels = len(bboxes) * (40 + 2 * FETCH_MARGIN) ** 2
+    assert pixels < (2000 + 2 * FETCH_MARGIN) ** 2 / 3
+    x, y = np.linspace(3.0, 1997.0, 1001), np.linspace(7.0, 1993.0, 1001)
+    for method in ("linear", "cubic"):
+        npt.assert_allclose(
+            sample_dem(dem, x, y, method), 0.5 * x + 0.25 * y, atol=1e-9
+        )
+
+
+def test_elevation_source_abstract():
+    """Sources must implement get_dem."""
+
+    class NoDEM(ElevationSource):
+        pass
+
+    with pytest.raises(TypeError):
+        NoDEM()
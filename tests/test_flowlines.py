@@ -0,0 +1,99 @@
+"""Test local COMID resolution and flowline storage."""
+from concurrent.futures import ThreadPoolExecutor
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import LineString
+
+from nldi_xstool import flowlines
+from nldi_xstool.flowlines import ComidResolver
+from nldi_xstool.flowlines import FlowlineStore
+from nldi_xstool.flowlines import NHDFlowlineIndex
+
+# two parallel flowlines about 890 m apart near Fort Morgan, CO
+LINES = {
+    "1001": LineString([(-103.80, 40.26), (-103.80, 40.28)]),
+    "1002": LineString([(-103.79, 40.26), (-103.79, 40.28)]),
+}
+
+
+class _FakeNLDI:
+    def getfeature_byid(self, fsource, fid):
+        return gpd.GeoDataFrame(
+            {"comid": [fid]}, geometry=[LINES[fid]], crs="epsg:4326"
+        )
+
+
+def _nearest_comid(lon, lat):
+    return "1001" if abs(lon + 103.80) < abs(lon + 103.79) else "1002"
+
+
+def test_comid_resolver(monkeypatch, tmp_path):
+    """Points near a known flowline are resolved without the NLDI."""
+    calls = []
+
+    def fake_cid(lon, lat):
+        calls.append((lon, lat))
+        return _nearest_comid(lon, lat)
+
+    monkeypatch.setattr(flowlines, "get_cid_from_lonlat", fake_cid)
+    monkeypatch.setattr(flowlines, "NLDI", _FakeNLDI)
+    monkeypatch.setattr(flowlines, "_store", FlowlineStore(tmp_path / "fl.sqlite"))
+    resolver = ComidResolver(tolerance=25.0)
+
+    comid, fl = resolver.lookup(-103.80005, 40.27)
+    assert comid == "1001"
+    assert fl.crs == "epsg:5070"
+    comid, _fl = resolver.lookup(-103.80010, 40.265)
+    assert comid == "1001"
+    comid, _fl = resolver.lookup(-103.79, 40.27)
+    assert comid == "1002"
+    assert len(calls) == 2
+    assert resolver.stats() == {"hits": 1, "misses": 2, "flowlines": 2}
+
+    # counters stay exact under concurrent lookups
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _i: resolver.lookup(-103.80010, 40.265), range(400)))
+    assert resolver.stats() == {"hits": 401, "misses": 2, "flowlines": 2}
+
+
+def test_flowline_store(monkeypatch, tmp_path):
+    """Flowlines are read back projected, and refetched once stale."""
+    monkeypatch.setattr(flowlines, "NLDI", _FakeNLDI)
+    path = tmp_path / "fl.sqlite"
+    store = FlowlineStore(path)
+    fl = store.fetch("1001")
+    assert fl.crs == "epsg:5070"
+    assert store.get("1002") is None
+
+    stored = FlowlineStore(path).get("1001")
+    assert stored.comid[0] == "1001"
+    assert stored.geometry[0].equals_exact(fl.geometry[0], 1e-6)
+    assert FlowlineStore(path, nhdplus_version="NHDPlusHR").get("1001") is None
+    assert FlowlineStore(path, ttl=-1.0).get("1001") is None
+    assert FlowlineStore(path, crs="epsg:3857").get("1001") is None
+    store.invalidate("1001")
+    assert store.get("1001") is None
+
+
+def test_nhd_flowline_index(tmp_path):
+    """Many points are matched to their nearest flowline in one query."""
+    path = tmp_path / "nhd.gpkg"
+    gpd.GeoDataFrame(
+        {"COMID": [1001, 1002]}, geometry=list(LINES.values()), crs="epsg:4326"
+    ).to_file(path, driver="GPKG")
+    index = NHDFlowlineIndex(path, max_distance=1000.0)
+
+    comids = index.lookup_many(
+        [-103.8001, -103.7902, -103.7950, -103.70], [40.27, 40.265, 40.27, 40.27]
+    )
+    assert list(comids[:2]) == ["1001", "1002"]
+    assert comids[2] in ("1001", "1002")
+    assert comids[3] is None
+
+    comid, fl = index.lookup(-103.7902, 40.265)
+    assert comid == "1002"
+    assert fl.crs == "epsg:5070"
+    assert fl.geometry[0].length > 2000.0
+    with pytest.raises(LookupError):
+        index.lookup(-103.70, 40.27)
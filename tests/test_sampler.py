@@ -0,0 +1,63 @@
+"""Test the array DEM sampler against xarray interpolation."""
+import numpy as np
+import pytest
+import xarray as xr
+
+from nldi_xstool.sampler import DEMMosaic
+from nldi_xstool.sampler import sample_dataframe
+from nldi_xstool.sampler import sample_dem
+
+
+@pytest.fixture
+def dem():
+    """Rough 10 m DEM with north-up rows and a scalar coordinate."""
+    rng = np.random.default_rng(0)
+    x = np.arange(1000.0, 1500.0, 10.0)
+    y = np.arange(2500.0, 2000.0, -10.0)
+    return xr.DataArray(
+        rng.normal(100.0, 5.0, (y.size, x.size)),
+        coords={"y": y, "x": x, "spatial_ref": 0},
+        dims=("y", "x"),
+        name="elevation",
+    )
+
+
+@pytest.mark.parametrize("method", ["linear", "nearest"])
+def test_sample_matches_interp(dem, method):
+    """Bilinear and nearest samples match DataArray.interp."""
+    rng = np.random.default_rng(1)
+    x = rng.uniform(990.0, 1500.0, 2000)
+    y = rng.uniform(2000.0, 2510.0, 2000)
+    expected = dem.interp(x=("z", x), y=("z", y), method=method).values
+    np.testing.assert_allclose(sample_dem(dem, x, y, method), expected, atol=1e-9)
+
+
+def test_sample_dataframe(dem):
+    """The DataFrame has the columns of DataArray.interp().to_dataframe()."""
+    x = np.array([[1005.0, 1200.0], [1333.0, 1480.0]])
+    y = np.array([[2495.0, 2300.0], [2111.0, 2020.0]])
+    expected = dem.interp(x=("z", x.ravel()), y=("z", y.ravel())).to_dataframe()
+    df = sample_dataframe(dem, x, y)
+    assert list(df.columns) == list(expected.columns)
+    np.testing.assert_allclose(df.elevation, expected.elevation)
+
+
+def test_sample_cubic_and_nodata(dem):
+    """Bicubic samples reproduce a plane, nodata pixels give NaN."""
+    plane = 0.5 * dem.x + 0.25 * dem.y + 0.0 * dem
+    x = np.array([1111.1, 1234.5, 1400.0])
+    y = np.array([2222.2, 2345.6, 2100.0])
+    z = sample_dem(plane, x, y, "cubic")
+    np.testing.assert_allclose(z, 0.5 * x + 0.25 * y)
+    holed = plane.copy()
+    holed[10, 10] = -9999.0
+    z = sample_dem(holed, [1105.0, 1300.0], [2395.0, 2300.0], nodata=-9999.0)
+    assert np.isnan(z[0]) and not np.isnan(z[1])
+
+
+def test_mosaic_grid(dem):
+    """Tiles off the pixel grid of the first tile are rejected."""
+    west, east = dem.isel(x=slice(0, 25)), dem.isel(x=slice(25, None))
+    DEMMosaic([west, east], 250.0)
+    with pytest.raises(ValueError, match="pixel grid"):
+        DEMMosaic([west, east.assign_coords(x=east.x + 4.0)], 250.0)
@@ -0,0 +1,28 @@
+"""Test the cached coordinate transformers."""
+import threading
+
+import numpy as np
+from pyproj import Transformer
+
+from nldi_xstool.transform import get_transformer
+from nldi_xstool.transform import transform
+
+
+def test_transformer_cache():
+    """Transformers are reused within a thread and not shared across threads."""
+    t1 = get_transformer("EPSG:4326", "epsg:3857")
+    assert get_transformer("epsg:4326", "epsg:3857") is t1
+    other = []
+    thread = threading.Thread(
+        target=lambda: other.append(get_transformer("epsg:4326", "epsg:3857"))
+    )
+    thread.start()
+    thread.join()
+    assert other[0] is not t1
+
+    lon, lat = np.array([-103.8, -96.2]), np.array([40.27, 39.06])
+    x, y = transform(lon, lat, "epsg:4326", "epsg:5071")
+    ex, ey = Transformer.from_crs(4326, 5071, always_xy=True).transform(lon, lat)
+    np.testing.assert_allclose(x, ex)
+    np.testing.assert_allclose(y, ey)
+    np.testing.assert_array_equal(transform(lon, lat, "epsg:4326", "EPSG:4326")[0], lon)
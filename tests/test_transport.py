@@ -0,0 +1,71 @@
+"""Test the shared HTTP transport without network access."""
+import asyncio
+
+import pytest
+import requests
+
+from nldi_xstool.transport import Transport
+
+
+class _Response:
+    def __init__(self, status, body=None):
+        self.status_code = status
+        self.body = body
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+    def json(self):
+        return self.body
+
+
+def _transport(monkeypatch, replies):
+    """Transport whose session answers each GET with the next reply."""
+    transport = Transport(retries=2, backoff=0.0)
+    calls = []
+
+    def get(url, params=None, timeout=None):
+        calls.append((url, params, timeout))
+        reply = replies[url].pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(transport.session, "get", get)
+    return transport, calls
+
+
+def test_retry(monkeypatch):
+    """Transient failures are retried, with the configured timeout."""
+    replies = {
+        "u": [requests.ConnectionError(), _Response(503), _Response(200, {"a": 1})],
+        "v": [_Response(503), _Response(502), _Response(500)],
+        "w": [_Response(404)],
+    }
+    transport, calls = _transport(monkeypatch, replies)
+    assert transport.get_json("u", {"p": 1}) == {"a": 1}
+    assert len(calls) == 3
+    assert calls[0] == ("u", {"p": 1}, transport.timeout)
+    with pytest.raises(requests.HTTPError):
+        transport.get_json("v")
+    assert len(calls) == 6
+    with pytest.raises(requests.HTTPError):
+        transport.get_json("w")
+    assert len(calls) == 7
+
+
+def test_get_json_many(monkeypatch):
+    """Batches keep their order and return failures in place."""
+    replies = {f"u{i}": [_Response(200, i)] for i in range(10)}
+    replies["u3"] = [_Response(404)]
+    transport, _calls = _transport(monkeypatch, replies)
+    queries = [(f"u{i}", None) for i in range(10)]
+    out = transport.get_json_many(queries)
+    assert [v for i, v in enumerate(out) if i != 3] == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert isinstance(out[3], requests.HTTPError)
+
+    replies.update({"a": [_Response(200, "a")], "b": [_Response(200, "b")]})
+    assert asyncio.run(transport.aget_json("a")) == "a"
+    assert asyncio.run(transport.aget_json_many([("b", None)])) == ["b"]
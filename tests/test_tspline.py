@@ -0,0 +1,56 @@
+"""Test the banded tension spline against the original routine."""
+import numpy as np
+import pytest
+
+from nldi_xstool.tspline import HAVE_NUMBA
+from nldi_xstool.tspline import TensionSpline
+from nldi_xstool.tspline import tspline
+from nldi_xstool.tspline import tspline_fast
+
+
+def _path(n):
+    t = np.linspace(0.0, 3.0 * np.pi, n)
+    x = 1000.0 * t + 50.0 * np.sin(3.0 * t)
+    y = 400.0 * np.sin(t)
+    dist = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))])
+    return dist, x, y
+
+
+@pytest.mark.parametrize("n", [3, 4, 25, 200])
+def test_tspline_fast_matches(n):
+    """Splines of x then y sharing work arrays match tspline."""
+    dist, x, y = _path(n)
+    sout = np.linspace(0.0, dist[-1], 4 * n + 1)
+    results = []
+    for func in (tspline, tspline_fast):
+        yp = np.zeros(n)
+        temp = np.zeros(n)
+        xout = np.zeros(sout.size)
+        yout = np.zeros(sout.size)
+        func(dist, x, n, sout, xout, sout.size, 10.0, yp, temp)
+        func(dist, y, n, sout, yout, sout.size, 10.0, yp, temp)
+        results.append((xout, yout, yp.copy()))
+    for new, old in zip(results[1], results[0]):
+        np.testing.assert_allclose(new, old, rtol=1e-9, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "use_numba",
+    [
+        False,
+        pytest.param(
+            True,
+            marks=pytest.mark.skipif(not HAVE_NUMBA, reason="numba is not installed"),
+        ),
+    ],
+)
+def test_tension_spline_derivative(use_numba):
+    """Derivatives agree with finite differences of the spline."""
+    dist, x, _y = _path(50)
+    spline = TensionSpline(dist, x, 10.0, use_numba=use_numba)
+    s = np.linspace(10.0, dist[-1] - 10.0, 101)
+    h = 1e-3
+    np.testing.assert_allclose(
+        spline.derivative(s), (spline(s + h) - spline(s - h)) / (2 * h), atol=1e-4
+    )
+    np.testing.assert_allclose(spline(dist), x, atol=1e-6)
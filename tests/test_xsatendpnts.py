@@ -1,9 +1,13 @@
 """Test getxsatendpts function."""
 from tempfile import NamedTemporaryFile
 
+import geopandas as gpd
+import numpy as np
 import pytest
+from shapely.geometry import LineString
 
 from nldi_xstool.nldi_xstool import getxsatendpts
+from nldi_xstool.PathGen import PathGen
 
 
 @pytest.mark.parametrize(
@@ -46,3 +50,34 @@ def test_run_getxsatendpts(path, numpts, crs, file, res):
     with NamedTemporaryFile(mode="w+") as tf:
         xs = getxsatendpts(path=path, numpts=numpts, crs=crs, file=tf.name, res=res)
         assert xs == 0
+
+
+def test_pathgen_points():
+    """Path points are spaced evenly from the start of the path."""
+    path = gpd.GeoDataFrame(geometry=[LineString([(0.0, 0.0), (300.0, 400.0)])])
+    x, y = PathGen(path_geom=path, ny=100).get_xs_points()
+    assert x.size == 101
+    np.testing.assert_allclose(np.hypot(np.diff(x), np.diff(y)), 500.0 / 101)
+    assert x[0] == 0.0 and y[0] == 0.0
+
+
+def test_getxsatendpts_polyline(plane_source):
+    """A dog-leg path is sampled from one DEM with continuous stationing."""
+    path = [(-103.8010, 40.2670), (-103.8010, 40.2700), (-103.7980, 40.2700)]
+    xs = getxsatendpts(path=path, numpts=101, res=10, source=plane_source)
+    assert plane_source.calls == 1
+    assert len(xs) == 101
+    station = xs["distance"].to_numpy()
+    assert np.all(np.diff(station) > 0.0)
+    # even spacing across the vertex
+    np.testing.assert_allclose(np.diff(station), station[1], rtol=0.02)
+    assert station[-1] > 500.0
+
+
+def test_getxsatendpts_auto_numpts(plane_source):
+    """Auto point count spaces points no more than a pixel apart."""
+    path = [(-1000.0, 1900000.0), (-900.0, 1900000.0)]
+    xs = getxsatendpts(
+        path=path, numpts="auto", res=1, crs="epsg:5070", source=plane_source
+    )
+    assert np.diff(xs["distance"]).max() <= 1.0 + 1e-6
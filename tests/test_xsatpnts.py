@@ -0,0 +1,151 @@
+"""Test batch cross-section functions without network access."""
+import geopandas as gpd
+import numpy as np
+import numpy.testing as npt
+import pytest
+from shapely.geometry import box
+
+from nldi_xstool import coverage
+from nldi_xstool import nldi_xstool
+from nldi_xstool import transport
+from nldi_xstool.coverage import CoverageIndex
+from nldi_xstool.nldi_xstool import best_resolution
+from nldi_xstool.nldi_xstool import getxsalongreach
+from nldi_xstool.nldi_xstool import getxsatpoint
+from nldi_xstool.nldi_xstool import getxsatpoints
+
+
+def test_getxsatpoints(nhd_index, plane_source):
+    """One DEM is fetched per cluster and every cross-section is returned."""
+    points = [(-103.8002, 40.265), (-104.8002, 40.27), (-103.8002, 40.27), (0.0, 0.0)]
+    with pytest.warns(UserWarning, match="point 3"):
+        xs = getxsatpoints(
+            points, numpoints=[11, 11, 21, 11], width=200.0, source=plane_source
+        )
+    assert plane_source.calls == 2
+    assert list(np.unique(xs.xs_id)) == [0, 1, 2]
+    assert (xs.xs_id == 2).sum() == 21
+    assert xs.crs == "epsg:4326"
+    assert not xs.elevation.isna().any()
+    first = xs[xs.xs_id == 0]
+    npt.assert_allclose(first["distance"].iloc[0], 0.0)
+    assert first["distance"].is_monotonic_increasing
+
+
+def test_getxsatpoints_unresolved(nhd_index, plane_source):
+    """Points without a COMID are skipped, and none resolving is an error."""
+    with pytest.warns(UserWarning), pytest.raises(LookupError):
+        getxsatpoints([(0.0, 0.0), (1.0, 1.0)], 11, 200.0, source=plane_source)
+    assert plane_source.calls == 0
+
+
+def test_getxsalongreach(nhd_index, plane_source):
+    """Cross-sections along a reach are sampled from one DEM."""
+    xs = getxsalongreach([-103.8002, 40.27], 500.0, 11, 200.0, source=plane_source)
+    assert plane_source.calls == 1
+    nxs = len(np.unique(xs.xs_id))
+    assert nxs == int(nhd_index.geoms[0].length // 500.0) + 1
+    assert len(xs) == 11 * nxs
+    stations = xs.groupby("xs_id").station.first()
+    npt.assert_allclose(np.diff(stations), 500.0)
+    assert not xs.elevation.isna().any()
+
+
+def test_getxsatpoint(nhd_index, plane_source):
+    """A single cross-section is centered on its reach, distances from its start."""
+    xs = getxsatpoint(
+        [-103.7995, 40.27], numpoints=101, width=500.0, source=plane_source
+    )
+    assert len(xs) == 101
+    assert xs.crs == "epsg:4326"
+    assert xs["distance"].iloc[0] == 0.0
+    npt.assert_allclose(np.diff(xs["distance"]), xs["distance"].iloc[1], rtol=1e-6)
+    mid = xs.geometry.iloc[50]
+    assert abs(mid.x + 103.8002) < 1e-4 and abs(mid.y - 40.27) < 1e-3
+
+
+def test_getxsatpoints_distance(nhd_index, plane_source):
+    """Scaled stations match reprojected distances, geodesic ones agree closely."""
+    points = [(-103.8002, 40.265), (-104.8002, 40.27)]
+    xs = getxsatpoints(points, numpoints=21, width=400.0, source=plane_source)
+    geo = getxsatpoints(
+        points, numpoints=21, width=400.0, source=plane_source, geodesic=True
+    )
+    for i in (0, 1):
+        sec = xs[xs.xs_id == i].to_crs("epsg:5071")
+        x, y = sec.geometry.x.to_numpy(), sec.geometry.y.to_numpy()
+        expected = np.hypot(x - x[0], y - y[0])
+        npt.assert_allclose(sec["distance"], expected, rtol=1e-6, atol=1e-6)
+        # EPSG:5071 scale is off by up to about 1% this far from its parallels
+        npt.assert_allclose(
+            geo[geo.xs_id == i]["distance"], expected, rtol=0.015, atol=1e-6
+        )
+
+
+def test_getxsatpoint_auto(nhd_index, plane_source, monkeypatch):
+    """Auto resolution is the finest covering the point, one point per pixel."""
+    index = CoverageIndex(
+        gpd.GeoDataFrame(
+            {"res_type": ["res_3m", "res_10m"]},
+            geometry=[box(-104.0, 40.0, -103.5, 40.5), box(-105.0, 40.0, -103.0, 41.0)],
+            crs="epsg:4326",
+        )
+    )
+    monkeypatch.setattr(coverage, "_index", index)
+    monkeypatch.setattr(coverage, "_loaded", True)
+    nldi_xstool._best_resolution.cache_clear()
+    xs = getxsatpoint(
+        [-103.7995, 40.27],
+        numpoints="auto",
+        width=300.0,
+        res="auto",
+        source=plane_source,
+    )
+    assert plane_source.res == 3
+    assert len(xs) == 101
+    npt.assert_allclose(xs["distance"].iloc[-1], 300.0, rtol=1e-3)
+    assert best_resolution((-104.5, 40.2, -104.4, 40.3)) == 10
+    assert best_resolution((10.0, 40.2, 10.1, 40.3)) == 10
+    # 3 m coverage ends at -103.5, so a bbox straddling it falls back to 10 m
+    assert best_resolution((-103.55, 40.2, -103.45, 40.3)) == 10
+    assert best_resolution((-103.55, 40.2, -103.5, 40.3)) == 3
+
+    # answers of a replaced index are not served from the cache
+    coverage.set_coverage_index(
+        CoverageIndex(
+            gpd.GeoDataFrame(
+                {"res_type": ["res_1m"]},
+                geometry=[box(-104.0, 40.0, -103.0, 40.5)],
+                crs="epsg:4326",
+            )
+        )
+    )
+    assert best_resolution((-103.55, 40.2, -103.5, 40.3)) == 1
+
+
+class _CoverTransport(transport.Transport):
+    """3DEPElevationIndex failing once, then serving two halves of 3 m coverage."""
+
+    def __init__(self):
+        super().__init__()
+        self.failed = False
+
+    def get_json(self, url, params=None):
+        if url.endswith("/19/query"):
+            if not self.failed:
+                self.failed = True
+                return {"error": {"code": 500, "message": "busy"}}
+            polys = [box(-104.0, 40.0, -103.5, 40.5), box(-103.5, 40.0, -103.0, 40.5)]
+            return gpd.GeoSeries(polys).__geo_interface__
+        return {"type": "FeatureCollection", "features": []}
+
+
+def test_best_resolution_rest(monkeypatch):
+    """Coverage split across polygons covers, and error responses are not cached."""
+    monkeypatch.setattr(coverage, "_index", None)
+    monkeypatch.setattr(coverage, "_loaded", True)
+    monkeypatch.setattr(transport, "_transport", _CoverTransport())
+    nldi_xstool._best_resolution.cache_clear()
+    bbox = (-103.55, 40.2, -103.45, 40.3)
+    assert best_resolution(bbox, default=30) == 30
+    assert best_resolution(bbox, default=30) == 3